@@ -2,12 +2,12 @@ from fastapi.security import HTTPBearer
 from fastapi.security.http import HTTPAuthorizationCredentials
 from fastapi import Request, Depends
 from utils import Tokens
-from db.redis import token_in_block_list
+from db.redis import token_in_block_list, get_user_version
 from db.database import get_session
 from sqlmodel.ext.asyncio.session import AsyncSession
 from auth.service import UserService
 from typing import List
-from db.models import User
+from config import Config
 from errors import (
     InvalidTokenException,
     RefreshTokenRequiredException,
@@ -30,14 +30,23 @@ class TokenBearer(HTTPBearer):
 
         token = creds.credentials
 
-        token_data = Tokens.decode_token(token)
+        # Every bearer instance that runs for this request shares the decoded
+        # token, so the JWT is decoded and checked against the blocklist once.
+        cached = getattr(request.state, "auth_token", None)
+
+        if cached is not None and cached[0] == token:
+            token_data = cached[1]
+        else:
+            token_data = Tokens.decode_token(token)
 
-        if token_data is None:
-            raise InvalidTokenException()
+            if token_data is None:
+                raise InvalidTokenException()
 
-        if await token_in_block_list(token_data["jti"]):
+            if await token_in_block_list(token_data["jti"]):
 
-            raise InvalidTokenException()
+                raise InvalidTokenException()
+
+            request.state.auth_token = (token, token_data)
 
         self.verify_token_data(token_data)
 
@@ -64,12 +73,21 @@ class RefreshTokenBearer(TokenBearer):
             raise RefreshTokenRequiredException()
 
 
+access_token_bearer = AccessTokenBearer()
+
+
 async def get_current_user(
-    token_details: dict = Depends(AccessTokenBearer()),
+    request: Request,
+    token_details: dict = Depends(access_token_bearer),
     session: AsyncSession = Depends(get_session),
 ):
+    if hasattr(request.state, "current_user"):
+        return request.state.current_user
+
     user_email = token_details["user"]["email"]
     user = await user_service.get_user_by_email(user_email, session)
+
+    request.state.current_user = user
     return user
 
 
@@ -77,15 +95,38 @@ class RoleChecker:
     def __init__(self, allowed_roles: List[str]) -> None:
         self.allowed_roles = allowed_roles
 
-    def __call__(self, current_user: User = Depends(get_current_user)):
+    async def __call__(
+        self,
+        request: Request,
+        token_details: dict = Depends(access_token_bearer),
+        session: AsyncSession = Depends(get_session),
+    ):
+        claims = token_details["user"]
+
+        # Tokens minted before the claims existed fall back to the user row
+        if Config.STATELESS_AUTH and "ver" in claims:
+            version = await get_user_version(claims["user_uid"])
+
+            if version is None and not Config.REVOCATION_FAIL_OPEN:
+                raise InvalidTokenException()
+
+            if version is not None and claims["ver"] < version:
+                raise InvalidTokenException()
+
+            return self.check(claims["role"], claims["is_verified"])
+
+        current_user = await get_current_user(request, token_details, session)
 
         if current_user is None:
             raise UserNotFoundException()
 
-        if not current_user.is_verified:
+        return self.check(current_user.role, current_user.is_verified)
+
+    def check(self, role: str, is_verified: bool) -> bool:
+        if not is_verified:
             raise AccountNotVerifiedException()
 
-        if current_user.role in self.allowed_roles:
+        if role in self.allowed_roles:
             return True
 
         raise InsufficientPermissionException()
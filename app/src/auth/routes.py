@@ -3,6 +3,7 @@ from auth.schema import (
     UserCreate,
     PasswordResetConfirm,
     UserLogin,
+    UserModel,
     UserBooksModel,
     EmailModel,
     PasswordResetRequest,
@@ -10,18 +11,23 @@ from auth.schema import (
 from auth.service import UserService
 from db.database import get_session
 from sqlmodel.ext.asyncio.session import AsyncSession
-from utils import Tokens, Hash, create_url_safe_token, decode_url_safe_token
+from utils import (
+    Tokens,
+    Hash,
+    create_url_safe_token,
+    decode_url_safe_token,
+    parse_fields,
+    projection_model,
+)
 from datetime import timedelta, datetime
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, Response
 from auth.dependencies import (
     RefreshTokenBearer,
-    AccessTokenBearer,
+    access_token_bearer,
     get_current_user,
     RoleChecker,
 )
 
-from mail import mail, create_message
-
 from errors import (
     UserAlreadyExistsException,
     InvalidCredentialsException,
@@ -31,7 +37,7 @@ from errors import (
 from db.redis import add_jti_to_blocklist
 from config import Config
 from fastapi.encoders import jsonable_encoder
-from celery_tasks import send_email
+from celery_tasks import enqueue_email, PRIORITY_HIGH, PRIORITY_LOW
 
 
 auth_router = APIRouter()
@@ -39,6 +45,7 @@ user_service = UserService()
 role_checker = RoleChecker(["admin", "user"])
 
 REFRESH_TOKEN_EXPIRY = 2
+USER_FIELDS = [field for field in UserModel.model_fields if field != "password_hash"]
 
 
 @auth_router.post("/send_mail")
@@ -46,16 +53,10 @@ async def send_mail(emails: EmailModel):
     emails = emails.addresses
     print(emails)
 
-    html = "<h1>Welcome to Bookly</h1>"
-
     subject = "Welcome to our app"
 
-    # message = create_message(recipients=emails, subject="Welcome", body=html)
-
-    # await mail.send_message(message)
-
     # This is we using celery tasks
-    send_email.delay(emails, subject, html)
+    enqueue_email(emails, subject, "welcome.html", priority=PRIORITY_LOW)
 
     return {"message": "Email sent successfully"}
 
@@ -75,28 +76,14 @@ async def create_user(
 
     new_user = await user_service.create_user(user_data, session)
     link = f"http://{Config.DOMAIN}/api/v1/auth/verify/{token}"
-    html_message = f"""
-    <h1> Verify your Email</h1>
-
-    <p> Please click this <a href="{link}">link</a> to verify your email </p>
-
-
-
-    """
 
     emails = [email]
     subject = "Verify Your Email"
 
     # This is we using celery tasks
-    send_email.delay(emails, subject, html_message)
-
-    # message = create_message(
-    #     recipients=[email], subject="Verify your email", body=html_message
-    # )
-
-    # #We can still use fast API background tasks
-
-    # bg_tasks.add_task(mail.send_message, message)
+    enqueue_email(
+        emails, subject, "verify_email.html", {"link": link}, priority=PRIORITY_HIGH
+    )
 
     return JSONResponse(
         content={
@@ -143,15 +130,13 @@ async def login(login_data: UserLogin, session: AsyncSession = Depends(get_sessi
     user = await user_service.get_user_by_email(email, session)
 
     if user is not None:
-        password_valid = Hash.verify_password(password, user.password_hash)
+        password_valid = await Hash.verify_password_async(
+            password, user.password_hash
+        )
 
         if password_valid:
             access_token = Tokens.create_access_token(
-                user_data={
-                    "email": user.email,
-                    "user_uid": str(user.uid),
-                    "role": user.role,
-                }
+                user_data=await user_service.token_claims(user)
             )
 
             refresh_token = Tokens.create_access_token(
@@ -180,11 +165,25 @@ async def login(login_data: UserLogin, session: AsyncSession = Depends(get_sessi
 
 
 @auth_router.get("/refresh_token")
-async def get_new_access_token(token_detials: dict = Depends(RefreshTokenBearer())):
+async def get_new_access_token(
+    token_detials: dict = Depends(RefreshTokenBearer()),
+    session: AsyncSession = Depends(get_session),
+):
     expiry_time_stamp = token_detials["exp"]
 
     if datetime.fromtimestamp(expiry_time_stamp) > datetime.now():
-        new_access_token = Tokens.create_access_token(user_data=token_detials["user"])
+        # Claims are re-read so the new token reflects role or verification
+        # changes made since login
+        user = await user_service.get_user_by_email(
+            token_detials["user"]["email"], session
+        )
+
+        if user is None:
+            raise UserNotFoundException()
+
+        new_access_token = Tokens.create_access_token(
+            user_data=await user_service.token_claims(user)
+        )
 
         return JSONResponse(
             content={
@@ -198,13 +197,28 @@ async def get_new_access_token(token_detials: dict = Depends(RefreshTokenBearer(
 
 @auth_router.get("/me", response_model=UserBooksModel)
 async def get_current_user(
-    user=Depends(get_current_user), _: bool = Depends(role_checker)
+    fields: str | None = None,
+    user=Depends(get_current_user),
+    _: bool = Depends(role_checker),
+    session: AsyncSession = Depends(get_session),
 ):
-    return user
+    fields = parse_fields(fields, USER_FIELDS)
+
+    # The principal is already loaded, so a projection costs no extra query
+    if fields:
+        projection = projection_model(UserModel, tuple(fields)).model_validate(
+            {field: getattr(user, field) for field in fields}
+        )
+        return Response(projection.model_dump_json(), media_type="application/json")
+
+    # The only endpoint that needs the user's books and reviews
+    return await user_service.get_user_by_email(
+        user.email, session, load_relationships=True
+    )
 
 
 @auth_router.get("/logout")
-async def revoke_token(token_details: dict = Depends(AccessTokenBearer())):
+async def revoke_token(token_details: dict = Depends(access_token_bearer)):
     jti = token_details["jti"]
 
     await add_jti_to_blocklist(jti)
@@ -233,18 +247,15 @@ async def password_reset_request(email_data: PasswordResetRequest):
     token = create_url_safe_token({"email": email})
 
     link = f"http://{Config.DOMAIN}/api/v1/auth/password-reset-confirm/{token}"
-    html_message = f"""
-    <h1> Reset Your Password</h1>
-
-    <p> Please click this <a href="{link}">link</a> to Reset Your Password </p>
-
-    """
 
-    message = create_message(
-        recipients=[email], subject="Reset Your Password", body=html_message
+    enqueue_email(
+        [email],
+        "Reset Your Password",
+        "password_reset.html",
+        {"link": link},
+        priority=PRIORITY_HIGH,
     )
 
-    await mail.send_message(message)
     return JSONResponse(
         content={
             "status": True,
@@ -276,7 +287,7 @@ async def reset_account_password(
         if not user:
             raise UserNotFoundException()
 
-        password_hash = Hash.generate_password_hash(new_password)
+        password_hash = await Hash.generate_password_hash_async(new_password)
 
         await user_service.update_user(user, {"password_hash": password_hash}, session)
 
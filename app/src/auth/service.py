@@ -1,14 +1,23 @@
 from db.models import User
 from sqlmodel.ext.asyncio.session import AsyncSession
 from utils import Hash
+from db.redis import bump_user_version, get_user_version
 from auth.schema import UserCreate
 from sqlmodel import select, desc
+from sqlalchemy.orm import selectinload
 
 
 class UserService:
-    async def get_user_by_email(self, email: str, session: AsyncSession):
+    async def get_user_by_email(
+        self, email: str, session: AsyncSession, load_relationships: bool = False
+    ):
         statement = select(User).where(User.email == email)
 
+        if load_relationships:
+            statement = statement.options(
+                selectinload(User.books), selectinload(User.reviews)
+            )
+
         result = await session.exec(statement)
 
         user = result.first()
@@ -29,7 +38,9 @@ class UserService:
             **user_data_dict
         )
 
-        new_user.password_hash = Hash.generate_password_hash(user_data_dict['password'])
+        new_user.password_hash = await Hash.generate_password_hash_async(
+            user_data_dict['password']
+        )
         new_user.role = "user"
 
         session.add(new_user)
@@ -37,10 +48,26 @@ class UserService:
         return new_user
 
 
+    async def token_claims(self, user: User) -> dict:
+        """The access token's user claim; enough for RoleChecker on its own"""
+        version = await get_user_version(user.uid)
+
+        return {
+            "email": user.email,
+            "user_uid": str(user.uid),
+            "role": user.role,
+            "is_verified": user.is_verified,
+            "ver": version or 0,
+        }
+
+
     async def update_user(self,user: User, user_data: dict, session: AsyncSession):
         for k, v in user_data.items():
             setattr(user, k, v)
 
         await session.commit()
 
+        # Access tokens carry role and is_verified; outdate the ones in flight
+        await bump_user_version(user.uid)
+
         return user
\ No newline at end of file
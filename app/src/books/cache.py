@@ -0,0 +1,186 @@
+from redis.exceptions import RedisError
+from db.redis import redis_client
+from books.schemas import BookDetailsModel, BookSuggestion
+from pydantic import TypeAdapter, ValidationError
+from config import Config
+from typing import Awaitable, Callable, List
+import asyncio
+import logging
+import uuid
+
+
+BOOK_CACHE_PREFIX = "book:"
+SUGGEST_CACHE_PREFIX = "suggest:"
+LOCK_POLL_INTERVAL = 0.05
+
+
+class BookCache:
+    """Read-through Redis cache of serialized BookDetailsModel payloads
+
+    stampede_protection decides what concurrent misses for the same book do:
+    "off" lets every request load from the database, "local" shares one load
+    per worker process, and "distributed" additionally takes a short Redis
+    lock so only one worker loads while the others poll for its result.
+    """
+
+    def __init__(self, ttl: int, stampede_protection: str, lock_timeout_ms: int):
+        self.ttl = ttl
+        self.stampede_protection = stampede_protection
+        self.lock_timeout_ms = lock_timeout_ms
+        self._loading: dict[str, asyncio.Future] = {}
+
+    def key(self, book_uid) -> str:
+        try:
+            book_uid = uuid.UUID(str(book_uid))
+        except ValueError:
+            pass
+
+        return f"{BOOK_CACHE_PREFIX}{book_uid}"
+
+    async def get(self, book_uid) -> BookDetailsModel | None:
+        try:
+            payload = await redis_client.get(self.key(book_uid))
+        except RedisError as e:
+            logging.warning("Book cache read failed: %s", e)
+            return None
+
+        if payload is None:
+            return None
+
+        try:
+            return BookDetailsModel.model_validate_json(payload)
+        except ValidationError as e:
+            # Written by a release with a different schema; reload it instead
+            logging.warning(
+                "Discarding book cache entry with %d schema errors", e.error_count()
+            )
+            return None
+
+    async def set(self, book: BookDetailsModel) -> None:
+        try:
+            await redis_client.set(
+                self.key(book.uid), book.model_dump_json(), ex=self.ttl
+            )
+        except RedisError as e:
+            logging.warning("Book cache write failed: %s", e)
+
+    async def invalidate(self, book_uid) -> None:
+        try:
+            await redis_client.delete(self.key(book_uid))
+        except RedisError as e:
+            logging.warning("Book cache invalidation failed: %s", e)
+
+    async def get_or_load(
+        self,
+        book_uid,
+        loader: Callable[[], Awaitable[BookDetailsModel | None]],
+    ) -> BookDetailsModel | None:
+        book = await self.get(book_uid)
+
+        if book is not None:
+            return book
+
+        if self.stampede_protection == "off":
+            return await self._load(loader)
+
+        key = self.key(book_uid)
+        loading = self._loading.get(key)
+
+        if loading is None:
+            if self.stampede_protection == "distributed":
+                load = self._load_with_lock(book_uid, loader)
+            else:
+                load = self._load(loader)
+
+            loading = asyncio.ensure_future(load)
+            self._loading[key] = loading
+            loading.add_done_callback(lambda _: self._loading.pop(key, None))
+
+        # Shielded so one caller going away does not cancel the shared load
+        return await asyncio.shield(loading)
+
+    async def _load(self, loader) -> BookDetailsModel | None:
+        book = await loader()
+
+        if book is not None:
+            await self.set(book)
+
+        return book
+
+    async def _load_with_lock(self, book_uid, loader) -> BookDetailsModel | None:
+        lock_key = f"{self.key(book_uid)}:lock"
+
+        try:
+            acquired = await redis_client.set(
+                lock_key, "", nx=True, px=self.lock_timeout_ms
+            )
+        except RedisError as e:
+            logging.warning("Book cache lock failed: %s", e)
+            return await self._load(loader)
+
+        if acquired:
+            try:
+                return await self._load(loader)
+            finally:
+                await self._release_lock(lock_key)
+
+        # Another worker is loading this book; wait for it to fill the cache
+        # and fall back to loading ourselves if it does not within the timeout.
+        waited = 0.0
+        while waited * 1000 < self.lock_timeout_ms:
+            await asyncio.sleep(LOCK_POLL_INTERVAL)
+            waited += LOCK_POLL_INTERVAL
+
+            book = await self.get(book_uid)
+            if book is not None:
+                return book
+
+        return await self._load(loader)
+
+    async def _release_lock(self, lock_key: str) -> None:
+        try:
+            await redis_client.delete(lock_key)
+        except RedisError as e:
+            logging.warning("Book cache unlock failed: %s", e)
+
+
+book_cache = BookCache(
+    ttl=Config.BOOK_CACHE_TTL,
+    stampede_protection=Config.BOOK_CACHE_STAMPEDE_PROTECTION,
+    lock_timeout_ms=Config.BOOK_CACHE_LOCK_TIMEOUT_MS,
+)
+
+
+class SuggestionCache:
+    """Short-lived Redis cache of typeahead results for hot prefixes"""
+
+    adapter = TypeAdapter(List[BookSuggestion])
+
+    def __init__(self, ttl: int):
+        self.ttl = ttl
+
+    def key(self, q: str, limit: int) -> str:
+        return f"{SUGGEST_CACHE_PREFIX}{limit}:{q}"
+
+    async def get(self, q: str, limit: int) -> List[BookSuggestion] | None:
+        try:
+            payload = await redis_client.get(self.key(q, limit))
+        except RedisError as e:
+            logging.warning("Suggestion cache read failed: %s", e)
+            return None
+
+        if payload is None:
+            return None
+
+        return self.adapter.validate_json(payload)
+
+    async def set(self, q: str, limit: int, suggestions: List[BookSuggestion]):
+        try:
+            await redis_client.set(
+                self.key(q, limit), self.adapter.dump_json(suggestions), ex=self.ttl
+            )
+        except RedisError as e:
+            logging.warning("Suggestion cache write failed: %s", e)
+
+
+suggestion_cache = SuggestionCache(ttl=Config.SUGGEST_CACHE_TTL)
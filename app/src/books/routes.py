@@ -1,49 +1,211 @@
-from fastapi import APIRouter, status, Depends
+from fastapi import APIRouter, status, Depends, Query, Request, HTTPException
+from fastapi.responses import StreamingResponse, Response
+from pydantic import create_model
+from pydantic import ValidationError
 from sqlmodel.ext.asyncio.session import AsyncSession
-from typing import List
+from typing import List, Literal
 from db.database import get_session
-from books.schemas import Book, BooksUpdate, BooksCreate, BookDetailsModel
-from books.service import BookService
-from auth.dependencies import AccessTokenBearer, RoleChecker
+from books.schemas import (
+    Book,
+    BooksUpdate,
+    BooksCreate,
+    BookDetailsModel,
+    BookPage,
+    BookBulkResult,
+    BookBulkResponse,
+    BookSuggestion,
+    book_page_adapter,
+)
+from books.service import BookService, BOOK_VERSION_FIELDS
+from auth.dependencies import access_token_bearer, RoleChecker
+from config import Config
+from utils import parse_fields, projection_model, make_etag, etag_matches
+from functools import lru_cache
 from errors import (
     BookNotFoundException,
 )
+import json
 
 book_router = APIRouter()
 book_service = BookService()
-access_token_bearer = AccessTokenBearer()
 role_checker = Depends(RoleChecker(["admin", "user"]))
 
 
+def book_version(book) -> tuple:
+    if isinstance(book, dict):
+        return tuple(book[field] for field in BOOK_VERSION_FIELDS)
+
+    return tuple(getattr(book, field) for field in BOOK_VERSION_FIELDS)
+
+
+def page_etag(page: dict, *params) -> str:
+    # Weak: equal tags mean the same books at the same versions, not
+    # byte-identical bodies
+    versions = [book_version(book) for book in page["items"]]
+
+    return make_etag(versions, page["next_cursor"], *params, weak=True)
+
+
+def not_modified(request: Request, etag: str) -> Response | None:
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(
+            status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag}
+        )
+
+    return None
+
+
+def book_page_response(page: dict, response: Response, etag: str):
+    if Config.FAST_JSON_RESPONSES:
+        page = book_page_adapter.validate_python(page, from_attributes=True)
+        return Response(
+            book_page_adapter.dump_json(page),
+            media_type="application/json",
+            headers={"ETag": etag},
+        )
+
+    response.headers["ETag"] = etag
+    return page
+
+
+@lru_cache(maxsize=256)
+def book_page_projection(fields: tuple[str, ...]):
+    return create_model(
+        "BookPageProjection",
+        __base__=BookPage,
+        items=(List[projection_model(Book, fields)], []),
+    )
+
+
 @book_router.get(
     "/",
-    response_model=List[BookDetailsModel],
+    response_model=BookPage,
     status_code=status.HTTP_200_OK,
     dependencies=[role_checker],
 )
 async def get_all_books(
+    request: Request,
+    response: Response,
+    limit: int = Query(Config.DEFAULT_PAGE_SIZE, ge=1, le=Config.MAX_PAGE_SIZE),
+    cursor: str | None = None,
+    sort: Literal["recent", "top_rated", "most_reviewed"] = "recent",
+    min_rating: float | None = Query(None, ge=0),
+    min_reviews: int | None = Query(None, ge=0),
+    reviews: int = Query(Config.EMBEDDED_REVIEWS, ge=0, le=Config.MAX_EMBEDDED_REVIEWS),
+    fields: str | None = None,
     session: AsyncSession = Depends(get_session),
     token_details: dict = Depends(access_token_bearer),
 ):
+    fields = parse_fields(fields, Book.model_fields)
+
+    books = await book_service.get_all_books(
+        session, limit, cursor, sort, min_rating, min_reviews, reviews, fields
+    )
 
-    books = await book_service.get_all_books(session)
-    return books
+    etag = page_etag(books, reviews, fields)
+
+    if cached := not_modified(request, etag):
+        return cached
+
+    if fields:
+        page = book_page_projection(tuple(fields)).model_validate(books)
+        return Response(
+            page.model_dump_json(),
+            media_type="application/json",
+            headers={"ETag": etag},
+        )
+
+    return book_page_response(books, response, etag)
 
 
 @book_router.get(
     "/user/{user_uid}",
-    response_model=List[BookDetailsModel],
+    response_model=BookPage,
     status_code=status.HTTP_200_OK,
     dependencies=[role_checker],
 )
 async def get_all_user_books(
     user_uid: str,
+    request: Request,
+    response: Response,
+    limit: int = Query(Config.DEFAULT_PAGE_SIZE, ge=1, le=Config.MAX_PAGE_SIZE),
+    cursor: str | None = None,
+    reviews: int = Query(Config.EMBEDDED_REVIEWS, ge=0, le=Config.MAX_EMBEDDED_REVIEWS),
     session: AsyncSession = Depends(get_session),
     token_details: dict = Depends(access_token_bearer),
 ):
 
-    books = await book_service.get_user_books(user_uid, session)
-    return books
+    books = await book_service.get_user_books(
+        user_uid, session, limit, cursor, reviews
+    )
+
+    etag = page_etag(books, reviews)
+
+    if cached := not_modified(request, etag):
+        return cached
+
+    return book_page_response(books, response, etag)
+
+
+@book_router.get(
+    "/search",
+    response_model=BookPage,
+    status_code=status.HTTP_200_OK,
+    dependencies=[role_checker],
+)
+async def search_books(
+    request: Request,
+    response: Response,
+    q: str = Query(min_length=1, max_length=200),
+    limit: int = Query(Config.DEFAULT_PAGE_SIZE, ge=1, le=Config.MAX_PAGE_SIZE),
+    cursor: str | None = None,
+    session: AsyncSession = Depends(get_session),
+    token_details: dict = Depends(access_token_bearer),
+):
+    books = await book_service.search_books(q, session, limit, cursor)
+
+    etag = page_etag(books)
+
+    if cached := not_modified(request, etag):
+        return cached
+
+    return book_page_response(books, response, etag)
+
+
+@book_router.get(
+    "/suggest",
+    response_model=List[BookSuggestion],
+    status_code=status.HTTP_200_OK,
+    dependencies=[role_checker],
+)
+async def suggest_books(
+    q: str = Query(max_length=100),
+    limit: int = Query(Config.SUGGEST_MAX_RESULTS, ge=1, le=Config.SUGGEST_MAX_RESULTS),
+    session: AsyncSession = Depends(get_session),
+    token_details: dict = Depends(access_token_bearer),
+):
+    suggestions = await book_service.suggest_books(q, limit, session)
+    return suggestions
+
+
+@book_router.get(
+    "/export",
+    status_code=status.HTTP_200_OK,
+    dependencies=[role_checker],
+    response_class=StreamingResponse,
+    responses={200: {"content": {"application/x-ndjson": {}}}},
+)
+async def export_books(
+    fields: str | None = None,
+    include_reviews: bool = False,
+    token_details: dict = Depends(access_token_bearer),
+):
+    fields = parse_fields(fields, Book.model_fields) or list(Book.model_fields)
+
+    return StreamingResponse(
+        book_service.export_books(fields, include_reviews, Config.EXPORT_CHUNK_SIZE),
+        media_type="application/x-ndjson",
+    )
 
 
 @book_router.get(
@@ -54,12 +216,44 @@ async def get_all_user_books(
 )
 async def get_single_book(
     book_uid: str,
+    request: Request,
+    response: Response,
+    reviews: int = Query(Config.EMBEDDED_REVIEWS, ge=0, le=Config.MAX_EMBEDDED_REVIEWS),
+    fields: str | None = None,
     session: AsyncSession = Depends(get_session),
     token_details: dict = Depends(access_token_bearer),
 ):
-    book = await book_service.get_book(book_uid, session)
+    fields = parse_fields(fields, Book.model_fields)
+
+    # Both lookups go to the Redis copy first, so a warm revalidation is
+    # answered without touching Postgres or serializing the body
+    if fields:
+        book = await book_service.get_book_fields(book_uid, fields, session)
+
+        if book is None:
+            raise BookNotFoundException()
+
+        etag = make_etag(*book_version(book), fields)
+
+        if cached := not_modified(request, etag):
+            return cached
+
+        book = projection_model(Book, tuple(fields)).model_validate(book)
+        return Response(
+            book.model_dump_json(),
+            media_type="application/json",
+            headers={"ETag": etag},
+        )
+
+    book = await book_service.get_book_details(book_uid, reviews)
     # return book
     if book:
+        etag = make_etag(*book_version(book), reviews)
+
+        if cached := not_modified(request, etag):
+            return cached
+
+        response.headers["ETag"] = etag
         return book
     else:
         raise BookNotFoundException()
@@ -86,6 +280,102 @@ async def create_book(
     return new_book
 
 
+def parse_bulk_books(body: bytes, content_type: str) -> list:
+    """Split a JSON array or NDJSON body into raw items, one per book"""
+    try:
+        if content_type.startswith("application/x-ndjson"):
+            return [line for line in body.splitlines() if line.strip()]
+
+        items = json.loads(body)
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail="Malformed request body"
+        )
+
+    if not isinstance(items, list):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Expected a JSON array of books",
+        )
+
+    return items
+
+
+@book_router.post(
+    "/bulk",
+    response_model=BookBulkResponse,
+    status_code=status.HTTP_200_OK,
+    dependencies=[role_checker],
+    openapi_extra={
+        "requestBody": {
+            "required": True,
+            "content": {
+                "application/json": {
+                    "schema": {
+                        "type": "array",
+                        "items": {"$ref": "#/components/schemas/BooksCreate"},
+                    }
+                },
+                "application/x-ndjson": {"schema": {"type": "string"}},
+            },
+        }
+    },
+)
+async def create_books_bulk(
+    request: Request,
+    session: AsyncSession = Depends(get_session),
+    token_details: dict = Depends(access_token_bearer),
+):
+    items = parse_bulk_books(
+        await request.body(), request.headers.get("content-type", "")
+    )
+
+    if len(items) > Config.BULK_MAX_ITEMS:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"At most {Config.BULK_MAX_ITEMS} books per request",
+        )
+
+    results = []
+    valid_books = []
+    valid_results = []
+
+    for index, item in enumerate(items):
+        try:
+            if isinstance(item, bytes):
+                book = BooksCreate.model_validate_json(item)
+            else:
+                book = BooksCreate.model_validate(item)
+        except ValidationError as e:
+            results.append(
+                BookBulkResult(
+                    index=index,
+                    status="invalid",
+                    errors=json.loads(e.json(include_url=False)),
+                )
+            )
+            continue
+
+        result = BookBulkResult(index=index, status="created")
+        results.append(result)
+        valid_books.append(book)
+        valid_results.append(result)
+
+    user_id = token_details.get("user")["user_uid"]
+    uids = await book_service.create_books_bulk(
+        valid_books, user_id, session, Config.BULK_CHUNK_SIZE
+    )
+
+    for result, uid in zip(valid_results, uids):
+        result.uid = uid
+
+    return BookBulkResponse(
+        created=len(valid_results),
+        failed=len(results) - len(valid_results),
+        results=results,
+    )
+
+
 @book_router.patch(
     "/{book_uid}",
     response_model=Book,
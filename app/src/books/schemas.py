@@ -1,8 +1,8 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, TypeAdapter
 from datetime import datetime, date
 from reviews.schema import Review
 import uuid
-from typing import List
+from typing import Any, List, Optional
 
 
 
@@ -15,6 +15,8 @@ class Book(BaseModel):
     page_count: int
     language: str
     user_uid: uuid.UUID | None = None
+    review_count: int = 0
+    avg_rating: float = 0.0
     created_at: datetime
     updated_at: datetime
 
@@ -26,6 +28,22 @@ class BookDetailsModel(Book):
     reviews: List[Review] = []
 
 
+class BookPage(BaseModel):
+    items: List[BookDetailsModel] = []
+    next_cursor: Optional[str] = None
+
+
+# Compiled once; list endpoints can validate and dump pages straight to bytes
+# through it instead of going through response_model on every request
+book_page_adapter = TypeAdapter(BookPage)
+
+
+class BookSuggestion(BaseModel):
+    uid: uuid.UUID
+    title: str
+    author: str
+
+
 class BooksUpdate(BaseModel):
     title: str
     publisher: str
@@ -39,4 +57,17 @@ class BooksCreate(BaseModel):
     publisher: str
     page_count: int
     language: str
-    published_date: date
\ No newline at end of file
+    published_date: date
+
+
+class BookBulkResult(BaseModel):
+    index: int
+    status: str
+    uid: Optional[uuid.UUID] = None
+    errors: Optional[List[Any]] = None
+
+
+class BookBulkResponse(BaseModel):
+    created: int
+    failed: int
+    results: List[BookBulkResult] = []
@@ -1,27 +1,264 @@
 from sqlmodel.ext.asyncio.session import AsyncSession
-from books.schemas import BooksCreate, BooksUpdate
-from db.models import Book
-from sqlmodel import select, desc
+from books.schemas import BooksCreate, BooksUpdate, BookDetailsModel, BookSuggestion
+from books.cache import book_cache, suggestion_cache
+from db.models import Book, Reviews, BOOK_SEARCH_DOCUMENT_SQL
+from db.database import async_session
+from sqlmodel import select, desc, tuple_, insert, true, func, literal_column, or_, text
+from sqlalchemy import select as select_columns
+from sqlalchemy.exc import DBAPIError
+from pydantic_core import to_json
+from collections import defaultdict
+from utils import (
+    encode_cursor,
+    decode_cursor,
+    encode_sort_cursor,
+    decode_sort_cursor,
+)
+from config import Config
+from datetime import datetime
+from typing import AsyncIterator, List
+import uuid
+import re
+import logging
+
+
+# Sort orders for the book list: the column to order by and how to read its
+# value back out of a cursor. uid always breaks ties.
+BOOK_SORTS = {
+    "recent": (Book.created_at, datetime.fromisoformat),
+    "top_rated": (Book.avg_rating, float),
+    "most_reviewed": (Book.review_count, int),
+}
+
+# Columns an ETag is derived from; projections always carry them along
+BOOK_VERSION_FIELDS = ["uid", "updated_at", "review_count"]
+
+MAX_SEARCH_TERMS = 8
+QUERY_CANCELED = "57014"
+
+# asyncpg (the Postgres wire protocol) caps bind parameters per statement
+MAX_BIND_PARAMS = 32767
+# Set on each bulk row alongside the BooksCreate fields
+BULK_SERVER_COLUMNS = ("uid", "user_uid", "created_at", "updated_at")
 
 
 class BookService:
-    async def get_all_books(self, session: AsyncSession):
-        statement = select(Book).order_by(desc(Book.created_at))
+    async def paginate_books(
+        self,
+        statement,
+        limit: int,
+        cursor: str | None,
+        session: AsyncSession,
+        sort: str = "recent",
+    ):
+        # Keyset pagination on (sort key, uid) so every page costs the same
+        # no matter how deep into the catalog the client has scrolled.
+        sort_column, sort_type = BOOK_SORTS[sort]
+
+        if cursor is not None:
+            key, uid = decode_sort_cursor(cursor, sort, sort_type, uuid.UUID)
+            statement = statement.where(
+                tuple_(sort_column, Book.uid) < tuple_(key, uid)
+            )
+
+        statement = statement.order_by(desc(sort_column), desc(Book.uid)).limit(
+            limit + 1
+        )
 
         result = await session.exec(statement)
 
-        return result.all()
+        books = result.all()
+
+        next_cursor = None
+        if len(books) > limit:
+            books = books[:limit]
+            last = books[-1]
+            next_cursor = encode_sort_cursor(
+                sort, getattr(last, sort_column.key), last.uid
+            )
+
+        return {"items": books, "next_cursor": next_cursor}
+
+    async def with_recent_reviews(
+        self, books: list, reviews_limit: int, session: AsyncSession
+    ) -> List[BookDetailsModel]:
+        reviews = defaultdict(list)
+
+        if books and reviews_limit > 0:
+            reviews = await self.get_recent_reviews_for_books(
+                [book.uid for book in books], reviews_limit, session
+            )
+
+        return [
+            BookDetailsModel.model_validate(
+                book.model_dump() | {"reviews": reviews[book.uid]}
+            )
+            for book in books
+        ]
+
+    async def get_recent_reviews_for_books(
+        self, book_uids: list, reviews_limit: int, session: AsyncSession
+    ):
+        # LATERAL takes at most reviews_limit rows per book straight off the
+        # (book_uid, created_at, uid) index, however many reviews a book has.
+        books = select(Book.uid).where(Book.uid.in_(book_uids)).subquery()
+        recent = (
+            select(*Reviews.__table__.columns)
+            .where(Reviews.book_uid == books.c.uid)
+            .order_by(desc(Reviews.created_at), desc(Reviews.uid))
+            .limit(reviews_limit)
+            .lateral()
+        )
+        statement = select(*recent.c).select_from(books).join(recent, true())
 
-    async def get_user_books(self, user_uid: str, session: AsyncSession):
-        statement = (
-            select(Book)
-            .where(Book.user_uid == user_uid)
-            .order_by(desc(Book.created_at))
+        result = await session.exec(statement)
+
+        reviews = defaultdict(list)
+        for review in result.mappings():
+            reviews[review["book_uid"]].append(dict(review))
+
+        return reviews
+
+    async def get_all_books(
+        self,
+        session: AsyncSession,
+        limit: int,
+        cursor: str | None = None,
+        sort: str = "recent",
+        min_rating: float | None = None,
+        min_reviews: int | None = None,
+        reviews_limit: int = 0,
+        fields: List[str] | None = None,
+    ):
+        if fields:
+            # Only the requested columns plus what the keyset needs; no reviews
+            sort_column, _ = BOOK_SORTS[sort]
+            columns = dict.fromkeys([*fields, *BOOK_VERSION_FIELDS, sort_column.key])
+            statement = select_columns(*[getattr(Book, column) for column in columns])
+        else:
+            statement = select(Book)
+
+        if min_rating is not None:
+            statement = statement.where(Book.avg_rating >= min_rating)
+
+        if min_reviews is not None:
+            statement = statement.where(Book.review_count >= min_reviews)
+
+        page = await self.paginate_books(statement, limit, cursor, session, sort)
+
+        if fields:
+            page["items"] = [dict(row._mapping) for row in page["items"]]
+        else:
+            page["items"] = await self.with_recent_reviews(
+                page["items"], reviews_limit, session
+            )
+
+        return page
+
+    async def get_user_books(
+        self,
+        user_uid: str,
+        session: AsyncSession,
+        limit: int,
+        cursor: str | None = None,
+        reviews_limit: int = 0,
+    ):
+        statement = select(Book).where(Book.user_uid == user_uid)
+
+        page = await self.paginate_books(statement, limit, cursor, session)
+        page["items"] = await self.with_recent_reviews(
+            page["items"], reviews_limit, session
         )
 
+        return page
+
+    async def search_books(
+        self,
+        q: str,
+        session: AsyncSession,
+        limit: int,
+        cursor: str | None = None,
+    ):
+        # Only word characters reach to_tsquery, each as a prefix match, so
+        # user input can never form tsquery operators.
+        terms = re.findall(r"\w+", q.lower())[:MAX_SEARCH_TERMS]
+
+        if not terms:
+            return {"items": [], "next_cursor": None}
+
+        query = func.to_tsquery("english", " & ".join(f"{term}:*" for term in terms))
+        document = literal_column(BOOK_SEARCH_DOCUMENT_SQL)
+        rank = func.ts_rank_cd(document, query)
+
+        statement = select(Book, rank).where(document.op("@@")(query))
+
+        if cursor is not None:
+            last_rank, uid = decode_cursor(cursor, float, uuid.UUID)
+            statement = statement.where(tuple_(rank, Book.uid) < tuple_(last_rank, uid))
+
+        statement = statement.order_by(desc(rank), desc(Book.uid)).limit(limit + 1)
+
         result = await session.exec(statement)
 
-        return result.all()
+        rows = result.all()
+
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            last_book, last_rank = rows[-1]
+            next_cursor = encode_cursor(last_rank, last_book.uid)
+
+        return {
+            "items": await self.with_recent_reviews(
+                [book for book, _ in rows], 0, session
+            ),
+            "next_cursor": next_cursor,
+        }
+
+    async def suggest_books(
+        self, q: str, limit: int, session: AsyncSession
+    ) -> List[BookSuggestion]:
+        q = " ".join(q.lower().split())
+
+        if len(q) < Config.SUGGEST_MIN_LENGTH:
+            return []
+
+        suggestions = await suggestion_cache.get(q, limit)
+
+        if suggestions is not None:
+            return suggestions
+
+        pattern = "%" + re.sub(r"([\\%_])", r"\\\1", q) + "%"
+        score = func.greatest(
+            func.similarity(Book.title, q), func.similarity(Book.author, q)
+        )
+        statement = (
+            select(Book.uid, Book.title, Book.author)
+            .where(or_(Book.title.ilike(pattern), Book.author.ilike(pattern)))
+            .order_by(desc(score))
+            .limit(limit)
+        )
+
+        try:
+            # Typeahead is only useful if it is fast: past the budget the
+            # query is cancelled and the client just gets no suggestions.
+            await session.exec(
+                text(f"SET LOCAL statement_timeout = {int(Config.SUGGEST_TIMEOUT_MS)}")
+            )
+            result = await session.exec(statement)
+            rows = result.mappings().all()
+        except DBAPIError as e:
+            if getattr(e.orig, "sqlstate", None) != QUERY_CANCELED:
+                raise
+
+            logging.warning("Book suggestions for %r exceeded the time budget", q)
+            await session.rollback()
+            return []
+
+        suggestions = [BookSuggestion.model_validate(row) for row in rows]
+        await suggestion_cache.set(q, limit, suggestions)
+
+        return suggestions
 
     async def get_book(self, book_uid: str, session: AsyncSession):
         statement = select(Book).where(Book.uid == book_uid)
@@ -34,6 +271,98 @@ class BookService:
 
         # return result.first()
 
+    async def get_book_details(self, book_uid: str, reviews_limit: int):
+        # The cache holds the most reviews any request may embed; each request
+        # trims that down to what it asked for. The load may be shared by
+        # several requests, so it owns its session rather than borrowing the
+        # first caller's, which is closed if that caller disconnects.
+        async def load():
+            async with async_session() as session:
+                book = await self.get_book(book_uid, session)
+
+                if book is None:
+                    return None
+
+                (details,) = await self.with_recent_reviews(
+                    [book], Config.MAX_EMBEDDED_REVIEWS, session
+                )
+                return details
+
+        book = await book_cache.get_or_load(book_uid, load)
+
+        if book is None:
+            return None
+
+        return book.model_copy(update={"reviews": book.reviews[:reviews_limit]})
+
+    async def get_book_fields(
+        self, book_uid: str, fields: List[str], session: AsyncSession
+    ):
+        columns = dict.fromkeys([*fields, *BOOK_VERSION_FIELDS])
+
+        book = await book_cache.get(book_uid)
+
+        if book is not None:
+            return book.model_dump(include=set(columns))
+
+        statement = select_columns(*[getattr(Book, column) for column in columns]).where(
+            Book.uid == book_uid
+        )
+
+        result = await session.exec(statement)
+
+        row = result.mappings().first()
+
+        return dict(row) if row is not None else None
+
+    async def export_books(
+        self, fields: List[str], include_reviews: bool, chunk_size: int
+    ) -> AsyncIterator[bytes]:
+        # The body is streamed after the route returns, so the export owns its
+        # session instead of borrowing the request's.
+        async with async_session() as session:
+            columns = [Book.__table__.c[field] for field in fields]
+
+            if include_reviews and "uid" not in fields:
+                columns.append(Book.__table__.c.uid)
+
+            statement = (
+                select(*columns)
+                .order_by(Book.created_at, Book.uid)
+                .execution_options(yield_per=chunk_size)
+            )
+
+            result = await session.stream(statement)
+
+            async for partition in result.mappings().partitions():
+                rows = [dict(row) for row in partition]
+
+                if include_reviews:
+                    reviews = await self.get_reviews_for_books(
+                        [row["uid"] for row in rows], session
+                    )
+
+                    for row in rows:
+                        row["reviews"] = reviews[row["uid"]]
+
+                        if "uid" not in fields:
+                            del row["uid"]
+
+                yield b"".join(to_json(row) + b"\n" for row in rows)
+
+    async def get_reviews_for_books(self, book_uids: list, session: AsyncSession):
+        statement = select(*Reviews.__table__.columns).where(
+            Reviews.book_uid.in_(book_uids)
+        )
+
+        result = await session.exec(statement)
+
+        reviews = defaultdict(list)
+        for review in result.mappings():
+            reviews[review["book_uid"]].append(dict(review))
+
+        return reviews
+
     async def create_book(
         self, book_data: BooksCreate, user_uid: str, session: AsyncSession
     ):
@@ -51,6 +380,44 @@ class BookService:
         await session.commit()
         return new_book
 
+    async def create_books_bulk(
+        self,
+        books: List[BooksCreate],
+        user_uid: str,
+        session: AsyncSession,
+        chunk_size: int,
+    ) -> List[uuid.UUID]:
+        now = datetime.now()
+        user_uid = uuid.UUID(str(user_uid))
+        uids = []
+
+        # Every value is a bind parameter, and a statement may carry at most
+        # MAX_BIND_PARAMS of them whatever BULK_CHUNK_SIZE says
+        columns = len(BooksCreate.model_fields) + len(BULK_SERVER_COLUMNS)
+        chunk_size = max(1, min(chunk_size, MAX_BIND_PARAMS // columns))
+
+        # One multi-row INSERT per chunk and a single commit for the batch
+        for start in range(0, len(books), chunk_size):
+            rows = []
+
+            for book in books[start : start + chunk_size]:
+                uid = uuid.uuid4()
+                uids.append(uid)
+                rows.append(
+                    {
+                        **book.model_dump(),
+                        "uid": uid,
+                        "user_uid": user_uid,
+                        "created_at": now,
+                        "updated_at": now,
+                    }
+                )
+
+            await session.exec(insert(Book).values(rows))
+
+        await session.commit()
+        return uids
+
     async def update_book(
         self, book_uid: str, book_data: BooksUpdate, session: AsyncSession
     ):
@@ -71,7 +438,10 @@ class BookService:
             for k, v in update_data_dict.items():
                 setattr(book_to_update, k, v)
 
+            book_to_update.updated_at = datetime.now()
+
             await session.commit()
+            await book_cache.invalidate(book_uid)
 
             return book_to_update
 
@@ -94,6 +464,7 @@ class BookService:
             await session.delete(book_to_delete)
 
             await session.commit()
+            await book_cache.invalidate(book_uid)
 
             return {}
 
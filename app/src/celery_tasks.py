@@ -1,14 +1,314 @@
 from celery import Celery
-from mail import mail, create_message
+from celery.signals import (
+    worker_init,
+    worker_process_init,
+    worker_process_shutdown,
+    worker_shutdown,
+)
+from mail import mail, create_message, precompile_templates, render_template
+from mail_worker import mail_worker
+from config import Config
 from asgiref.sync import async_to_sync
+from aiosmtplib import SMTPException
+from fastapi_mail.errors import ConnectionErrors
+from metrics import (
+    CELERY_ENQUEUE_LATENCY,
+    EMAIL_BATCH_SIZE,
+    EMAIL_BATCH_DURATION,
+    EMAIL_BATCH_COALESCED,
+    EMAIL_BATCH_FAILED,
+)
+from redis import Redis
+from redis.exceptions import RedisError
+import json
+import logging
+import time
+import uuid
 
 c_app = Celery()
 
 c_app.config_from_object("app.src.config")
 
+# Lower is sooner: someone is waiting on a password reset, nobody is waiting
+# on a welcome mail
+PRIORITY_HIGH = 0
+PRIORITY_NORMAL = 5
+PRIORITY_LOW = 9
 
-@c_app.task()
-def send_email(recipients: list[str], subject: str, body: str):
+MAIL_BATCH_PREFIX = "mail:batch:"
+MAIL_BATCH_PROCESSING = "mail:batch:processing"
+
+# The web process pushes to the buffer from sync code, like the broker publish
+batch_buffer = Redis.from_url(Config.REDIS_URL)
+
+
+@c_app.task(
+    ignore_result=True,
+    autoretry_for=(ConnectionErrors, SMTPException, OSError),
+    max_retries=Config.MAIL_MAX_RETRIES,
+    retry_backoff=True,
+    retry_backoff_max=Config.MAIL_RETRY_BACKOFF_MAX,
+    retry_jitter=True,
+)
+def send_email(
+    recipients: list[str], subject: str, template_name: str, context: dict
+):
+    body = render_template(template_name, context)
     message = create_message(recipients=recipients, subject=subject, body=body)
 
-    async_to_sync(mail.send_message)(message)
+    if Config.MAIL_WORKER_MODE == "pooled":
+        mail_worker.send(message)
+    else:
+        async_to_sync(mail.send_message)(message)
+
+
+@worker_init.connect
+def compile_templates(**kwargs):
+    # Runs in the parent before prefork, so every child inherits them compiled
+    precompile_templates()
+
+
+@worker_process_init.connect
+def start_mail_worker(**kwargs):
+    # Each prefork child needs its own loop thread; start it before the first task
+    if Config.MAIL_WORKER_MODE == "pooled":
+        mail_worker.start()
+
+
+@worker_process_shutdown.connect
+@worker_shutdown.connect
+def stop_mail_worker(**kwargs):
+    mail_worker.stop()
+
+
+@c_app.on_after_configure.connect
+def schedule_email_batch_sweep(sender, **kwargs):
+    # Needs celery beat running (or a worker started with -B)
+    if Config.MAIL_BATCH_WINDOW_MS > 0:
+        sender.add_periodic_task(
+            Config.MAIL_BATCH_SWEEP_INTERVAL, sweep_email_batches.s()
+        )
+
+
+def batch_key(priority: int) -> str:
+    return f"{MAIL_BATCH_PREFIX}{priority}"
+
+
+def schedule_flush(priority: int, countdown: float = 0) -> None:
+    """Schedule a flush of one priority's buffer unless one is already pending
+
+    The flag expires on its own, so a flush task that is lost in the broker
+    only holds the buffer up until the next email or sweep after that.
+    """
+    flag = f"{batch_key(priority)}:scheduled"
+    ttl = int((countdown + Config.MAIL_BATCH_LEASE_SECONDS) * 1000)
+
+    if not batch_buffer.set(flag, "", nx=True, px=ttl):
+        return
+
+    try:
+        flush_email_batch.apply_async(
+            (priority,), countdown=countdown, priority=priority
+        )
+    except Exception:
+        batch_buffer.delete(flag)
+        raise
+
+
+def claim_email_batch(priority: int) -> tuple[str, list[bytes]]:
+    """Move up to MAIL_BATCH_MAX_SIZE emails into a fresh processing list
+
+    The processing list is recorded with the time it was claimed, so if the
+    worker dies before releasing it, sweep_email_batches puts the emails back.
+    """
+    processing = f"{batch_key(priority)}:processing:{uuid.uuid4().hex}"
+
+    with batch_buffer.pipeline(transaction=True) as pipe:
+        pipe.zadd(MAIL_BATCH_PROCESSING, {processing: time.time()})
+        for _ in range(Config.MAIL_BATCH_MAX_SIZE):
+            pipe.lmove(batch_key(priority), processing, "LEFT", "RIGHT")
+        _, *moved = pipe.execute()
+
+    return processing, [payload for payload in moved if payload is not None]
+
+
+def release_email_batch(processing: str) -> None:
+    with batch_buffer.pipeline(transaction=True) as pipe:
+        pipe.delete(processing)
+        pipe.zrem(MAIL_BATCH_PROCESSING, processing)
+        pipe.execute()
+
+
+@c_app.task(ignore_result=True)
+def flush_email_batch(priority: int):
+    # Cleared first so emails buffered from here on schedule their own flush
+    batch_buffer.delete(f"{batch_key(priority)}:scheduled")
+
+    # Drain in chunks; flushes running side by side claim disjoint chunks
+    while True:
+        processing, payloads = claim_email_batch(priority)
+
+        if not payloads:
+            release_email_batch(processing)
+            return
+
+        emails = [json.loads(payload) for payload in payloads]
+
+        try:
+            send_email_batch(emails, priority)
+        except Exception as e:
+            # If this raises too the processing list is kept for the sweep
+            logging.warning("Email batch failed, sending one by one: %s", e)
+            requeue_emails(emails, priority)
+
+        release_email_batch(processing)
+
+
+@c_app.task(ignore_result=True)
+def sweep_email_batches():
+    """Put back emails from abandoned batches and flush anything left waiting"""
+    abandoned = batch_buffer.zrangebyscore(
+        MAIL_BATCH_PROCESSING, 0, time.time() - Config.MAIL_BATCH_LEASE_SECONDS
+    )
+
+    for processing in abandoned:
+        processing = processing.decode()
+        buffer = processing.split(":processing:")[0]
+
+        # Back to the front of the buffer, oldest first, so they go out next
+        while batch_buffer.lmove(processing, buffer, "RIGHT", "LEFT"):
+            pass
+
+        batch_buffer.zrem(MAIL_BATCH_PROCESSING, processing)
+
+    for priority in range(PRIORITY_HIGH, PRIORITY_LOW + 1):
+        if batch_buffer.llen(batch_key(priority)):
+            schedule_flush(priority)
+
+
+def requeue_emails(emails: list[dict], priority: int) -> None:
+    """Hand emails to send_email one by one, which retries them with backoff"""
+    for email in emails:
+        send_email.apply_async(
+            (
+                email["recipients"],
+                email["subject"],
+                email["template_name"],
+                email["context"],
+            ),
+            priority=priority,
+        )
+
+
+def send_email_batch(emails: list[dict], priority: int) -> None:
+    """Send a batch over one SMTP session, dropping exact duplicates
+
+    Messages that fail are re-queued through send_email. Emails stay in a
+    processing list until the batch is done, so a crash part way through
+    sends them again once swept; delivery is at least once.
+    """
+    start = time.perf_counter()
+
+    unique = list(
+        {
+            (
+                tuple(email["recipients"]),
+                email["subject"],
+                email["template_name"],
+                json.dumps(email["context"], sort_keys=True),
+            ): email
+            for email in emails
+        }.values()
+    )
+    messages = [
+        create_message(
+            recipients=email["recipients"],
+            subject=email["subject"],
+            body=render_template(email["template_name"], email["context"]),
+        )
+        for email in unique
+    ]
+
+    if Config.MAIL_WORKER_MODE == "pooled":
+        failed = mail_worker.send_batch(messages)
+    else:
+        try:
+            # FastMail sends a list of messages over a single connection
+            async_to_sync(mail.send_message)(messages)
+            failed = []
+        except Exception as e:
+            logging.warning("Email batch failed: %s", e)
+            failed = list(range(len(messages)))
+
+    requeue_emails([unique[index] for index in failed], priority)
+
+    EMAIL_BATCH_SIZE.observe(len(emails))
+    EMAIL_BATCH_COALESCED.inc(len(emails) - len(unique))
+    EMAIL_BATCH_FAILED.inc(len(failed))
+    EMAIL_BATCH_DURATION.observe(time.perf_counter() - start)
+
+
+def buffer_email(
+    recipients: list[str],
+    subject: str,
+    template_name: str,
+    context: dict,
+    priority: int,
+):
+    payload = json.dumps(
+        {
+            "recipients": recipients,
+            "subject": subject,
+            "template_name": template_name,
+            "context": context,
+        }
+    )
+    pending = batch_buffer.rpush(batch_key(priority), payload)
+
+    # A full batch flushes right away, otherwise the first email opens the
+    # window. The email is safely buffered either way, so if no flush can be
+    # scheduled the next email or the periodic sweep will pick it up.
+    try:
+        if pending % Config.MAIL_BATCH_MAX_SIZE == 0:
+            flush_email_batch.apply_async((priority,), priority=priority)
+        else:
+            schedule_flush(priority, countdown=Config.MAIL_BATCH_WINDOW_MS / 1000)
+    except Exception as e:
+        logging.warning("Could not schedule an email batch flush: %s", e)
+
+
+def enqueue_email(
+    recipients: list[str],
+    subject: str,
+    template_name: str,
+    context: dict | None = None,
+    priority: int = PRIORITY_NORMAL,
+):
+    """Queue an email, timing how long the broker publish takes
+
+    Only the template name and its context travel over the broker; the
+    worker renders the body.
+
+    With MAIL_BATCH_WINDOW_MS set, emails are buffered in Redis and sent in
+    batches by flush_email_batch instead of one send_email task each.
+    """
+    context = context or {}
+    start = time.perf_counter()
+    task = send_email
+
+    try:
+        if Config.MAIL_BATCH_WINDOW_MS > 0:
+            try:
+                task = flush_email_batch
+                return buffer_email(
+                    recipients, subject, template_name, context, priority
+                )
+            except RedisError as e:
+                logging.warning("Email batch buffer unavailable: %s", e)
+                task = send_email
+
+        return send_email.apply_async(
+            (recipients, subject, template_name, context), priority=priority
+        )
+    finally:
+        CELERY_ENQUEUE_LATENCY.labels(task.name).observe(time.perf_counter() - start)
@@ -0,0 +1,225 @@
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+import zlib
+
+# br is offered only with the brotli extra installed (uv sync --extra brotli)
+try:
+    import brotli
+except ImportError:
+    try:
+        import brotlicffi as brotli
+    except ImportError:
+        brotli = None
+
+
+COMPRESSIBLE_TYPES = ("text/", "application/json", "application/x-ndjson")
+
+
+class GzipCompressor:
+    def __init__(self, level: int):
+        # wbits=31 writes a gzip header and trailer around the deflate stream
+        self._compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.compress(data)
+
+    def flush(self) -> bytes:
+        return self._compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self) -> bytes:
+        return self._compressor.flush()
+
+
+class BrotliCompressor:
+    def __init__(self, quality: int):
+        self._compressor = brotli.Compressor(quality=quality)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.process(data)
+
+    def flush(self) -> bytes:
+        return self._compressor.flush()
+
+    def finish(self) -> bytes:
+        return self._compressor.finish()
+
+
+def choose_encoding(accept_encoding: str) -> str | None:
+    """Pick br or gzip from an Accept-Encoding header, honouring q=0"""
+    offered = {}
+
+    for part in accept_encoding.lower().split(","):
+        coding, _, params = part.strip().partition(";")
+        quality = 1.0
+
+        if params.strip().startswith("q="):
+            try:
+                quality = float(params.strip()[2:])
+            except ValueError:
+                quality = 0.0
+
+        offered[coding.strip()] = quality
+
+    supported = ["br", "gzip"] if brotli is not None else ["gzip"]
+    candidates = [
+        (offered.get(coding, offered.get("*", 0.0)), -rank, coding)
+        for rank, coding in enumerate(supported)
+    ]
+    quality, _, coding = max(candidates)
+
+    return coding if quality > 0 else None
+
+
+class CompressionMiddleware:
+    """Compresses response bodies with brotli (when installed) or gzip
+
+    Body chunks are held back until minimum_size bytes have arrived or the
+    body ends, so small responses go out untouched even when an inner
+    middleware (BaseHTTPMiddleware, for one) splits them into several
+    messages. Once compressing, every further chunk is flushed so clients
+    reading NDJSON line by line are not held up by the compressor's buffer.
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        minimum_size: int = 1024,
+        gzip_level: int = 6,
+        brotli_quality: int = 4,
+    ):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        encoding = choose_encoding(Headers(scope=scope).get("accept-encoding", ""))
+
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        responder = CompressionResponder(self, encoding, send)
+        await self.app(scope, receive, responder.send)
+
+    def compressor(self, encoding: str):
+        if encoding == "br":
+            return BrotliCompressor(self.brotli_quality)
+
+        return GzipCompressor(self.gzip_level)
+
+
+class CompressionResponder:
+    def __init__(self, middleware: CompressionMiddleware, encoding: str, send: Send):
+        self.middleware = middleware
+        self.encoding = encoding
+        self._send = send
+        self.start_message: Message | None = None
+        self.pending = b""
+        self.compressor = None
+
+    async def send(self, message: Message) -> None:
+        if message["type"] == "http.response.start":
+            # Held back until enough of the body has arrived to decide
+            self.start_message = message
+            return
+
+        if message["type"] != "http.response.body":
+            if self.start_message is not None:
+                await self._send(self.start_message)
+                self.start_message = None
+
+                if self.pending:
+                    await self._send(
+                        {
+                            "type": "http.response.body",
+                            "body": self.pending,
+                            "more_body": True,
+                        }
+                    )
+                    self.pending = b""
+
+            await self._send(message)
+            return
+
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+
+        if self.start_message is not None:
+            self.pending += body
+
+            if more_body and len(self.pending) < self.middleware.minimum_size:
+                return
+
+            body, self.pending = self.pending, b""
+            await self.start(body, more_body)
+            return
+
+        if self.compressor is None:
+            await self._send(message)
+            return
+
+        body = self.compressor.compress(body)
+        body += self.compressor.flush() if more_body else self.compressor.finish()
+
+        await self._send(
+            {"type": "http.response.body", "body": body, "more_body": more_body}
+        )
+
+    async def start(self, body: bytes, more_body: bool) -> None:
+        start_message, self.start_message = self.start_message, None
+        headers = MutableHeaders(raw=start_message["headers"])
+
+        if not self.compressible(start_message["status"], headers):
+            await self._send(start_message)
+            await self._send(
+                {"type": "http.response.body", "body": body, "more_body": more_body}
+            )
+            return
+
+        headers.add_vary_header("Accept-Encoding")
+
+        if not more_body and len(body) < self.middleware.minimum_size:
+            await self._send(start_message)
+            await self._send({"type": "http.response.body", "body": body})
+            return
+
+        self.compressor = self.middleware.compressor(self.encoding)
+        headers["Content-Encoding"] = self.encoding
+
+        # The encoded bytes differ from the identity representation, so a
+        # strong validator would be wrong; If-None-Match compares weakly anyway
+        etag = headers.get("etag")
+        if etag and not etag.startswith("W/"):
+            headers["ETag"] = f"W/{etag}"
+
+        body = self.compressor.compress(body)
+
+        if more_body:
+            body += self.compressor.flush()
+            if "content-length" in headers:
+                del headers["Content-Length"]
+        else:
+            body += self.compressor.finish()
+            headers["Content-Length"] = str(len(body))
+
+        await self._send(start_message)
+        await self._send(
+            {"type": "http.response.body", "body": body, "more_body": more_body}
+        )
+
+    def compressible(self, status_code: int, headers: MutableHeaders) -> bool:
+        if status_code < 200 or status_code in (204, 304):
+            return False
+
+        if "content-encoding" in headers:
+            return False
+
+        if "no-transform" in headers.get("cache-control", ""):
+            return False
+
+        return headers.get("content-type", "").startswith(COMPRESSIBLE_TYPES)
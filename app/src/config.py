@@ -16,9 +16,55 @@ class Settings(BaseSettings):
     MAIL_FROM_NAME: str
     MAIL_STARTTLS: bool = True
     MAIL_SSL_TLS: bool = False
+    MAIL_WORKER_MODE: str = "per_message"
+    MAIL_POOL_SIZE: int = 4
+    MAIL_MAX_MESSAGES_PER_CONNECTION: int = 100
+    MAIL_TIMEOUT: float = 60.0
+    MAIL_MAX_RETRIES: int = 5
+    MAIL_RETRY_BACKOFF_MAX: int = 600
+    MAIL_BATCH_WINDOW_MS: int = 0
+    MAIL_BATCH_MAX_SIZE: int = 100
+    MAIL_BATCH_LEASE_SECONDS: int = 300
+    MAIL_BATCH_SWEEP_INTERVAL: int = 60
+    MAIL_TEMPLATE_CACHE_DIR: str | None = None
     USE_CREDENTIALS: bool = True
     VALIDATE_CERTS: bool = True
     DOMAIN: str
+    DB_POOL_SIZE: int = 5
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_TIMEOUT: int = 30
+    DB_POOL_RECYCLE: int = 1800
+    DB_POOL_PRE_PING: bool = True
+    DB_STATEMENT_TIMEOUT_MS: int = 0
+    DEFAULT_PAGE_SIZE: int = 20
+    MAX_PAGE_SIZE: int = 100
+    EMBEDDED_REVIEWS: int = 5
+    MAX_EMBEDDED_REVIEWS: int = 20
+    BULK_MAX_ITEMS: int = 10000
+    BULK_CHUNK_SIZE: int = 1000
+    EXPORT_CHUNK_SIZE: int = 1000
+    FAST_JSON_RESPONSES: bool = False
+    COMPRESSION_MINIMUM_SIZE: int = 1024
+    COMPRESSION_GZIP_LEVEL: int = 6
+    COMPRESSION_BROTLI_QUALITY: int = 4
+    ACCESS_LOG_SAMPLE_RATE: float = 1.0
+    REQUEST_ID_HEADER: str = "X-Request-ID"
+    REVOCATION_CACHE_SIZE: int = 10000
+    REVOCATION_CACHE_NEGATIVE_TTL: float = 5.0
+    REVOCATION_FAIL_OPEN: bool = True
+    STATELESS_AUTH: bool = False
+    BOOK_CACHE_TTL: int = 300
+    BOOK_CACHE_STAMPEDE_PROTECTION: str = "local"
+    BOOK_CACHE_LOCK_TIMEOUT_MS: int = 2000
+    SUGGEST_MIN_LENGTH: int = 3
+    SUGGEST_MAX_RESULTS: int = 10
+    SUGGEST_CACHE_TTL: int = 60
+    SUGGEST_TIMEOUT_MS: int = 150
+    HASH_POOL_KIND: str = "thread"
+    HASH_POOL_WORKERS: int = 4
+    HASH_POOL_MAX_PENDING: int = 32
+    HASH_POOL_MAX_WAITERS: int = 256
+    HASH_POOL_WAIT_TIMEOUT_MS: int = 5000
 
     model_config = SettingsConfigDict(env_file=".env", extra="ignore")
 
@@ -28,4 +74,14 @@ broker_url =Config.REDIS_URL
 
 result_backend = Config.REDIS_URL
 
-broker_connection_retry_on_startup = True
\ No newline at end of file
+broker_connection_retry_on_startup = True
+
+# Redis emulates priorities with one list per step; 0 is served first
+broker_transport_options = {
+    "queue_order_strategy": "priority",
+    "priority_steps": list(range(10)),
+    "sep": ":",
+}
+
+# Without a default, unprioritised tasks would land on step 0 ahead of everything
+task_default_priority = 5
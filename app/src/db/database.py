@@ -1,15 +1,73 @@
-from sqlmodel import create_engine, text, SQLModel
-from sqlalchemy.ext.asyncio import AsyncEngine
+from sqlmodel import text, SQLModel
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 from config import Config
 from sqlmodel.ext.asyncio.session import AsyncSession
-from sqlalchemy.orm import sessionmaker
+from metrics import DB_POOL_CHECKED_OUT, DB_POOL_OVERFLOW, DB_POOL_CHECKOUT_WAIT
+import time
 
 
-engine = AsyncEngine(
-    create_engine(
-        url=Config.DATABASE_URL,
-        # echo=True
-    )
+class PoolStats:
+    """Running totals for how long requests wait to check out a connection"""
+
+    def __init__(self) -> None:
+        self.checkouts = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    def record_wait(self, seconds: float) -> None:
+        self.checkouts += 1
+        self.total_wait += seconds
+        self.max_wait = max(self.max_wait, seconds)
+
+
+pool_stats = PoolStats()
+
+
+class InstrumentedPool(AsyncAdaptedQueuePool):
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            wait = time.perf_counter() - start
+            pool_stats.record_wait(wait)
+            DB_POOL_CHECKOUT_WAIT.observe(wait)
+            self._report()
+
+    def _do_return_conn(self, record):
+        try:
+            return super()._do_return_conn(record)
+        finally:
+            self._report()
+
+    def _report(self) -> None:
+        DB_POOL_CHECKED_OUT.set(self.checkedout())
+        DB_POOL_OVERFLOW.set(max(self.overflow(), 0))
+
+
+connect_args = {}
+
+if Config.DB_STATEMENT_TIMEOUT_MS > 0:
+    connect_args["server_settings"] = {
+        "statement_timeout": str(Config.DB_STATEMENT_TIMEOUT_MS)
+    }
+
+
+engine = create_async_engine(
+    url=Config.DATABASE_URL,
+    poolclass=InstrumentedPool,
+    pool_size=Config.DB_POOL_SIZE,
+    max_overflow=Config.DB_MAX_OVERFLOW,
+    pool_timeout=Config.DB_POOL_TIMEOUT,
+    pool_recycle=Config.DB_POOL_RECYCLE,
+    pool_pre_ping=Config.DB_POOL_PRE_PING,
+    connect_args=connect_args,
+    # echo=True
+)
+
+async_session = async_sessionmaker(
+    bind=engine, class_=AsyncSession, expire_on_commit=False
 )
 
 
@@ -27,7 +85,23 @@ async def init_db():
 
 
 async def get_session() -> AsyncSession:
-    Session = sessionmaker(bind=engine, class_=AsyncSession, expire_on_commit=False)
-
-    async with Session() as session:
+    async with async_session() as session:
         yield session
+
+
+def get_pool_stats() -> dict:
+    pool = engine.pool
+
+    return {
+        "size": pool.size(),
+        "checked_in": pool.checkedin(),
+        "checked_out": pool.checkedout(),
+        "overflow": pool.overflow(),
+        "checkouts": pool_stats.checkouts,
+        "checkout_wait_avg_ms": (
+            pool_stats.total_wait / pool_stats.checkouts * 1000
+            if pool_stats.checkouts
+            else 0.0
+        ),
+        "checkout_wait_max_ms": pool_stats.max_wait * 1000,
+    }
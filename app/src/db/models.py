@@ -1,10 +1,25 @@
-from sqlmodel import SQLModel, Field, Column, Relationship
+from sqlmodel import SQLModel, Field, Column, Relationship, Index, Computed, text
 import sqlalchemy.dialects.postgresql as pg
 from datetime import datetime, date
 import uuid
 from typing import List, TYPE_CHECKING, Optional
 
 
+AVG_RATING_SQL = (
+    "CASE WHEN review_count > 0 "
+    "THEN CAST(rating_sum AS DOUBLE PRECISION) / review_count ELSE 0 END"
+)
+
+# Weighted full-text document for book search. The GIN index is built on this
+# expression rather than a stored column so `select(Book)` never drags a
+# tsvector along; queries must use the exact same expression to hit it.
+BOOK_SEARCH_DOCUMENT_SQL = (
+    "(setweight(to_tsvector('english', coalesce(title, '')), 'A') || "
+    "setweight(to_tsvector('english', coalesce(author, '')), 'B') || "
+    "setweight(to_tsvector('english', coalesce(publisher, '')), 'C'))"
+)
+
+
 class User(SQLModel, table=True):
     __tablename__ = "users"
 
@@ -12,7 +27,7 @@ class User(SQLModel, table=True):
         sa_column=Column(pg.UUID, nullable=False, primary_key=True, default=uuid.uuid4)
     )
     username: str
-    email: str
+    email: str = Field(unique=True, index=True)
     first_name: str
     last_name: str
     role: str = Field(
@@ -22,11 +37,12 @@ class User(SQLModel, table=True):
     password_hash: str = Field(exclude=True)
     created_at: datetime = Field(sa_column=Column(pg.TIMESTAMP, default=datetime.now))
     updated_at: datetime = Field(sa_column=Column(pg.TIMESTAMP, default=datetime.now))
+    # Never loaded implicitly: queries that need them opt in with selectinload
     books: List["Book"] = Relationship(
-        back_populates="user", sa_relationship_kwargs={"lazy": "selectin"}
+        back_populates="user", sa_relationship_kwargs={"lazy": "raise"}
     )
     reviews: List["Reviews"] = Relationship(
-        back_populates="user", sa_relationship_kwargs={"lazy": "selectin"}
+        back_populates="user", sa_relationship_kwargs={"lazy": "raise"}
     )
 
     def __repr__(self):
@@ -35,6 +51,34 @@ class User(SQLModel, table=True):
 
 class Book(SQLModel, table=True):
     __tablename__ = "books"
+    # Fetch avg_rating back with RETURNING on every INSERT and UPDATE; left
+    # expired, reading it after a commit would lazy load outside a greenlet
+    __mapper_args__ = {"eager_defaults": True}
+    # Match the (created_at, uid) keyset ordering used by the list endpoints
+    __table_args__ = (
+        Index("ix_books_created_at_uid", "created_at", "uid"),
+        Index("ix_books_user_uid_created_at_uid", "user_uid", "created_at", "uid"),
+        Index("ix_books_avg_rating_uid", "avg_rating", "uid"),
+        Index("ix_books_review_count_uid", "review_count", "uid"),
+        Index(
+            "ix_books_search_document",
+            text(BOOK_SEARCH_DOCUMENT_SQL),
+            postgresql_using="gin",
+        ),
+        # pg_trgm indexes behind /books/suggest
+        Index(
+            "ix_books_title_trgm",
+            "title",
+            postgresql_using="gin",
+            postgresql_ops={"title": "gin_trgm_ops"},
+        ),
+        Index(
+            "ix_books_author_trgm",
+            "author",
+            postgresql_using="gin",
+            postgresql_ops={"author": "gin_trgm_ops"},
+        ),
+    )
 
     uid: uuid.UUID = Field(
         sa_column=Column(pg.UUID, nullable=False, primary_key=True, default=uuid.uuid4)
@@ -46,11 +90,28 @@ class Book(SQLModel, table=True):
     page_count: int
     language: str
     user_uid: Optional[uuid.UUID] = Field(default=None, foreign_key="users.uid")
+    # Kept up to date by ReviewService.add_review_to_book in the same transaction
+    review_count: int = Field(
+        default=0, sa_column=Column(pg.INTEGER, nullable=False, server_default="0")
+    )
+    rating_sum: int = Field(
+        default=0, sa_column=Column(pg.INTEGER, nullable=False, server_default="0")
+    )
+    avg_rating: Optional[float] = Field(
+        default=None,
+        sa_column=Column(
+            pg.DOUBLE_PRECISION,
+            Computed(AVG_RATING_SQL, persisted=True),
+            nullable=False,
+        ),
+    )
     created_at: datetime = Field(sa_column=Column(pg.TIMESTAMP, default=datetime.now))
     updated_at: datetime = Field(sa_column=Column(pg.TIMESTAMP, default=datetime.now))
     user: Optional["User"] = Relationship(back_populates="books")
+    # Reviews are paged through ReviewService or embedded a few at a time by
+    # BookService.with_recent_reviews, never loaded wholesale with the book
     reviews: List["Reviews"] = Relationship(
-        back_populates="book", sa_relationship_kwargs={"lazy": "selectin"}
+        back_populates="book", sa_relationship_kwargs={"lazy": "raise"}
     )
 
     def __repr__(self):
@@ -59,13 +120,20 @@ class Book(SQLModel, table=True):
 
 class Reviews(SQLModel, table=True):
     __tablename__ = "reviews"
+    # Serve GET /reviews/book/{book_uid} in either sort order from an index
+    __table_args__ = (
+        Index("ix_reviews_book_uid_created_at_uid", "book_uid", "created_at", "uid"),
+        Index("ix_reviews_book_uid_rating_uid", "book_uid", "rating", "uid"),
+    )
 
     uid: uuid.UUID = Field(
         sa_column=Column(pg.UUID, nullable=False, primary_key=True, default=uuid.uuid4)
     )
     rating: int = Field(lt=5)
     review_text: str
-    user_uid: Optional[uuid.UUID] = Field(default=None, foreign_key="users.uid")
+    user_uid: Optional[uuid.UUID] = Field(
+        default=None, foreign_key="users.uid", index=True
+    )
     book_uid: Optional[uuid.UUID] = Field(default=None, foreign_key="books.uid")
     created_at: datetime = Field(sa_column=Column(pg.TIMESTAMP, default=datetime.now))
     updated_at: datetime = Field(sa_column=Column(pg.TIMESTAMP, default=datetime.now))
@@ -1,9 +1,21 @@
 from redis.asyncio import Redis
-from redis.exceptions import ConnectionError
+from redis.exceptions import RedisError
 from config import Config
+from metrics import (
+    REDIS_LATENCY,
+    REDIS_ERRORS,
+    REVOCATION_CACHE_HITS,
+    REVOCATION_CACHE_MISSES,
+)
+from collections import OrderedDict
+import asyncio
+import logging
+import time
 
 
 JTI_EXPIRY = 3600
+REVOCATION_CHANNEL = "bookly:revoked_jti"
+USER_VERSION_PREFIX = "user_version:"
 
 
 # token_blocklist = Redis(
@@ -13,7 +25,20 @@ JTI_EXPIRY = 3600
 #     decode_responses=True,
 # )
 
-token_blocklist = Redis.from_url(
+class InstrumentedRedis(Redis):
+    async def execute_command(self, *args, **options):
+        command = str(args[0]).upper()
+        start = time.perf_counter()
+        try:
+            return await super().execute_command(*args, **options)
+        except RedisError:
+            REDIS_ERRORS.labels(command).inc()
+            raise
+        finally:
+            REDIS_LATENCY.labels(command).observe(time.perf_counter() - start)
+
+
+redis_client = InstrumentedRedis.from_url(
     Config.REDIS_URL
     # host=Config.REDIS_HOST,
     # port=Config.REDIS_PORT,
@@ -21,6 +46,90 @@ token_blocklist = Redis.from_url(
     # decode_responses=True,
 )
 
+token_blocklist = redis_client
+
+
+class RevocationCache:
+    """Bounded LRU of blocklist lookups kept in each worker process
+
+    Revoked jtis are remembered until the token could have expired anyway.
+    "Not revoked" answers only live for negative_ttl seconds, which bounds how
+    long a revocation can go unnoticed if the pub/sub notification is lost.
+    """
+
+    def __init__(self, max_size: int, negative_ttl: float) -> None:
+        self.max_size = max_size
+        self.negative_ttl = negative_ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries: OrderedDict[str, tuple[bool, float]] = OrderedDict()
+
+    def get(self, jti: str) -> bool | None:
+        entry = self._entries.get(jti)
+
+        if entry is None or entry[1] < time.monotonic():
+            self.misses += 1
+            REVOCATION_CACHE_MISSES.inc()
+            return None
+
+        self._entries.move_to_end(jti)
+        self.hits += 1
+        REVOCATION_CACHE_HITS.inc()
+        return entry[0]
+
+    def put(self, jti: str, revoked: bool) -> None:
+        # A "not revoked" answer read from Redis may land after the pub/sub
+        # revocation for the same jti; it must never overwrite it
+        if not revoked and self._entries.get(jti, (False, 0))[0]:
+            return
+
+        ttl = JTI_EXPIRY if revoked else self.negative_ttl
+
+        self._entries[jti] = (revoked, time.monotonic() + ttl)
+        self._entries.move_to_end(jti)
+
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def stats(self) -> dict:
+        return {"size": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+
+revocation_cache = RevocationCache(
+    max_size=Config.REVOCATION_CACHE_SIZE,
+    negative_ttl=Config.REVOCATION_CACHE_NEGATIVE_TTL,
+)
+
+_revocation_listener: asyncio.Task | None = None
+
+
+async def _listen_for_revocations() -> None:
+    while True:
+        try:
+            async with redis_client.pubsub() as pubsub:
+                await pubsub.subscribe(REVOCATION_CHANNEL)
+                # Anything cached while we were not subscribed may have missed
+                # a revocation, so start over from Redis.
+                revocation_cache.clear()
+
+                async for message in pubsub.listen():
+                    if message["type"] == "message":
+                        revocation_cache.put(message["data"].decode(), True)
+
+        except RedisError as e:
+            logging.warning("Revocation feed disconnected: %s", e)
+            await asyncio.sleep(1)
+
+
+def _ensure_revocation_listener() -> None:
+    global _revocation_listener
+
+    if _revocation_listener is None or _revocation_listener.done():
+        _revocation_listener = asyncio.create_task(_listen_for_revocations())
+
 
 # async def add_jti_to_blocklist(jti: str) -> None:
 #     await token_blocklist.set(name=jti, value="", ex=JTI_EXPIRY)
@@ -34,13 +143,48 @@ token_blocklist = Redis.from_url(
 async def add_jti_to_blocklist(jti: str) -> None:
     await token_blocklist.set(jti, "", ex=JTI_EXPIRY)
 
+    revocation_cache.put(jti, True)
+    await token_blocklist.publish(REVOCATION_CHANNEL, jti)
+
 
 async def token_in_block_list(jti: str) -> bool:
+    _ensure_revocation_listener()
+
+    revoked = revocation_cache.get(jti)
+
+    if revoked is not None:
+        return revoked
+
     try:
-        return await token_blocklist.exists(jti) == 1
-    except ConnectionError:
-        print('No connection to redis')
-        return False
+        revoked = await token_blocklist.exists(jti) == 1
+    except RedisError as e:
+        logging.warning("Could not check the token blocklist: %s", e)
+        # Fail open keeps the API up when Redis is down; fail closed rejects
+        # every token we could not check.
+        return not Config.REVOCATION_FAIL_OPEN
+
+    revocation_cache.put(jti, revoked)
+    return revoked
 
 
     # return jti is not None
+
+
+async def get_user_version(user_uid) -> int | None:
+    """Version of a user's token claims, or None when Redis is unreachable"""
+    try:
+        version = await redis_client.get(f"{USER_VERSION_PREFIX}{user_uid}")
+    except RedisError as e:
+        logging.warning("Could not read token version for %s: %s", user_uid, e)
+        return None
+
+    return int(version) if version is not None else 0
+
+
+async def bump_user_version(user_uid) -> None:
+    # Deliberately never expires: if the counter were dropped and restarted
+    # at 1, a token minted at a higher version would pass the check again
+    try:
+        await redis_client.incr(f"{USER_VERSION_PREFIX}{user_uid}")
+    except RedisError as e:
+        logging.warning("Could not bump token version for %s: %s", user_uid, e)
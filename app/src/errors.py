@@ -2,6 +2,7 @@ from typing import Any, Callable
 from fastapi import status, FastAPI
 from fastapi.requests import Request
 from fastapi.responses import JSONResponse
+from config import Config
 
 
 class BooklyException(Exception):
@@ -64,6 +65,18 @@ class TagAlreadyExistsException(Exception):
     """Tag already exists"""
 
 
+class InvalidCursorException(Exception):
+    """User has provided a pagination cursor that cannot be decoded"""
+
+
+class InvalidFieldsException(Exception):
+    """User has asked for fields that the resource does not have"""
+
+
+class ServerBusyException(Exception):
+    """Too much work is already queued for the request to be accepted"""
+
+
 def create_exception_handler(
     status_code: int, initial_detail: Any
 ) -> Callable[[Request, Exception], JSONResponse]:
@@ -111,6 +124,45 @@ def register_all_errors(app: FastAPI):
         ),
     )
 
+    app.add_exception_handler(
+        InvalidCursorException,
+        create_exception_handler(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            initial_detail={
+                "status": False,
+                "message": "Invalid pagination cursor",
+                "resolution": "Use the next_cursor returned by the previous page",
+                "error_code": "invalid_cursor",
+            },
+        ),
+    )
+
+    app.add_exception_handler(
+        InvalidFieldsException,
+        create_exception_handler(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            initial_detail={
+                "status": False,
+                "message": "Unknown field requested",
+                "resolution": "Only request fields that the resource has",
+                "error_code": "invalid_fields",
+            },
+        ),
+    )
+
+    app.add_exception_handler(
+        ServerBusyException,
+        create_exception_handler(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            initial_detail={
+                "status": False,
+                "message": "The server is busy",
+                "resolution": "Please try again shortly",
+                "error_code": "server_busy",
+            },
+        ),
+    )
+
     app.add_exception_handler(
         InvalidCredentialsException,
         create_exception_handler(
@@ -201,10 +253,14 @@ def register_all_errors(app: FastAPI):
 
     @app.exception_handler(500)
     async def internal_server_error(request, exception):
+        # Set by the access log middleware, which the exception skipped past
+        request_id = getattr(request.state, "request_id", None)
+
         return JSONResponse(
             content={
                 "message": "Ooops! Something went wrong",
                 "error_code": "server_error",
             },
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            headers={Config.REQUEST_ID_HEADER: request_id} if request_id else None,
         )
@@ -1,9 +1,16 @@
 from fastapi_mail import FastMail, ConnectionConfig, MessageSchema, MessageType
+from jinja2 import (
+    Environment,
+    FileSystemBytecodeCache,
+    FileSystemLoader,
+    select_autoescape,
+)
 from config import Config
 from typing import List
 from pathlib import Path
 
 BASE_DIR = Path(__file__).resolve().parent
+TEMPLATE_FOLDER = Path(BASE_DIR, "templates")
 
 
 mail_config = ConnectionConfig(
@@ -17,11 +24,22 @@ mail_config = ConnectionConfig(
     MAIL_SSL_TLS=False,
     USE_CREDENTIALS=True,
     VALIDATE_CERTS=True,
-    TEMPLATE_FOLDER=Path(BASE_DIR, "templates"),
+    TEMPLATE_FOLDER=TEMPLATE_FOLDER,
 )
 
 mail = FastMail(config=mail_config)
 
+# Templates are only rendered in the Celery worker. Compiled templates stay
+# in the environment's cache, the bytecode cache spares a restarted worker
+# from compiling them again, and with auto_reload off rendering never stats
+# the files.
+template_env = Environment(
+    loader=FileSystemLoader(TEMPLATE_FOLDER),
+    bytecode_cache=FileSystemBytecodeCache(Config.MAIL_TEMPLATE_CACHE_DIR),
+    autoescape=select_autoescape(["html"]),
+    auto_reload=False,
+)
+
 # mail.send_message(message)
 
 
@@ -31,3 +49,12 @@ def create_message(recipients: List[str], subject: str, body: str):
     )
 
     return message
+
+
+def precompile_templates() -> None:
+    for name in template_env.list_templates():
+        template_env.get_template(name)
+
+
+def render_template(template_name: str, context: dict) -> str:
+    return template_env.get_template(template_name).render(context)
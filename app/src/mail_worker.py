@@ -0,0 +1,258 @@
+from aiosmtplib import SMTP, SMTPServerDisconnected
+from email.message import EmailMessage, Message
+from email.utils import formataddr, formatdate, make_msgid
+from fastapi_mail import MessageSchema
+from config import Config
+import asyncio
+import logging
+import os
+import threading
+
+
+def build_mime(message: MessageSchema, sender: str) -> EmailMessage:
+    """MIME for a message from create_message: recipients, subject, body
+
+    Built with the standard library rather than fastapi-mail's private
+    MailMsg._message; cc, bcc and attachments are not carried over.
+    """
+    mime = EmailMessage()
+    mime["Date"] = formatdate(localtime=True)
+    mime["Message-ID"] = make_msgid()
+    mime["From"] = sender
+    mime["To"] = ", ".join(
+        formataddr((recipient.name, recipient.email))
+        for recipient in message.recipients
+    )
+    mime["Subject"] = message.subject
+    mime.set_content(message.body, subtype=message.subtype.value)
+
+    return mime
+
+
+class SMTPConnectionPool:
+    """Authenticated SMTP sessions reused across messages
+
+    A session is retired with QUIT after max_messages sends, since servers cap
+    messages per session, and dropped on any error. Idle sessions the server
+    has closed in the meantime are replaced transparently, once per message.
+    """
+
+    def __init__(
+        self,
+        hostname: str,
+        port: int,
+        username: str | None,
+        password: str | None,
+        use_credentials: bool,
+        start_tls: bool,
+        use_tls: bool,
+        validate_certs: bool,
+        size: int,
+        max_messages: int,
+        timeout: float,
+    ) -> None:
+        self.hostname = hostname
+        self.port = port
+        self.username = username
+        self.password = password
+        self.use_credentials = use_credentials
+        self.start_tls = start_tls
+        self.use_tls = use_tls
+        self.validate_certs = validate_certs
+        self.size = size
+        self.max_messages = max_messages
+        self.timeout = timeout
+        self.connects = 0
+        self._idle: list[tuple[SMTP, int]] = []
+        self._slots = asyncio.Semaphore(size)
+
+    async def _connect(self) -> SMTP:
+        smtp = SMTP(
+            hostname=self.hostname,
+            port=self.port,
+            use_tls=self.use_tls,
+            start_tls=self.start_tls,
+            validate_certs=self.validate_certs,
+            timeout=self.timeout,
+        )
+        await smtp.connect()
+
+        if self.use_credentials:
+            await smtp.login(self.username, self.password)
+
+        self.connects += 1
+        return smtp
+
+    def _take_idle(self) -> tuple[SMTP, int] | None:
+        while self._idle:
+            # Most recently used first; it is the least likely to have timed out
+            smtp, sent = self._idle.pop()
+
+            if smtp.is_connected:
+                return smtp, sent
+
+            smtp.close()
+
+        return None
+
+    async def send(self, message: Message) -> None:
+        async with self._slots:
+            idle = self._take_idle()
+
+            if idle is not None:
+                smtp, sent = idle
+                try:
+                    await smtp.send_message(message)
+                except SMTPServerDisconnected:
+                    smtp.close()
+                    idle = None
+                except BaseException:
+                    smtp.close()
+                    raise
+
+            if idle is None:
+                smtp, sent = await self._connect(), 0
+                try:
+                    await smtp.send_message(message)
+                except BaseException:
+                    smtp.close()
+                    raise
+
+            sent += 1
+
+            if sent >= self.max_messages:
+                await self._quit(smtp)
+            else:
+                self._idle.append((smtp, sent))
+
+    async def send_many(self, messages: list[Message]) -> list[int]:
+        """Send messages back to back over one session; returns failed indexes
+
+        A message that fails is not retried here, and the session it failed
+        on is dropped. If no session can be opened at all, every message not
+        yet sent is reported as failed.
+        """
+        failed = []
+
+        async with self._slots:
+            smtp, sent = self._take_idle() or (None, 0)
+
+            for index, message in enumerate(messages):
+                if smtp is not None and sent >= self.max_messages:
+                    await self._quit(smtp)
+                    smtp = None
+
+                if smtp is None:
+                    try:
+                        smtp, sent = await self._connect(), 0
+                    except Exception as e:
+                        logging.warning("Could not open SMTP session: %s", e)
+                        failed.extend(range(index, len(messages)))
+                        break
+
+                try:
+                    await smtp.send_message(message)
+                    sent += 1
+                except Exception as e:
+                    logging.warning("Batched message failed: %s", e)
+                    failed.append(index)
+                    smtp.close()
+                    smtp = None
+
+            if smtp is not None:
+                self._idle.append((smtp, sent))
+
+        return failed
+
+    async def _quit(self, smtp: SMTP) -> None:
+        try:
+            await smtp.quit()
+        except Exception:
+            smtp.close()
+
+    async def close(self) -> None:
+        idle, self._idle = self._idle, []
+
+        for smtp, _ in idle:
+            await self._quit(smtp)
+
+
+class MailWorker:
+    """A long-lived event loop on a daemon thread plus its SMTP pool
+
+    Celery tasks are synchronous, so each one hands its coroutine to the loop
+    and waits. Everything is created lazily per process, which keeps prefork
+    children from inheriting a loop thread that did not survive the fork.
+    """
+
+    def __init__(self, sender: str, **pool_options) -> None:
+        self.sender = sender
+        self.pool_options = pool_options
+        self.pool: SMTPConnectionPool | None = None
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._thread: threading.Thread | None = None
+        self._pid: int | None = None
+        self._lock = threading.Lock()
+
+    def start(self) -> None:
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+
+            self._loop = asyncio.new_event_loop()
+            self._thread = threading.Thread(
+                target=self._loop.run_forever, name="mail-worker", daemon=True
+            )
+            self._thread.start()
+            self.pool = SMTPConnectionPool(**self.pool_options)
+            self._pid = os.getpid()
+
+    def run(self, coro):
+        self.start()
+        return asyncio.run_coroutine_threadsafe(coro, self._loop).result()
+
+    def send(self, message: MessageSchema) -> None:
+        self.run(self._send(message))
+
+    async def _send(self, message: MessageSchema) -> None:
+        await self.pool.send(build_mime(message, self.sender))
+
+    def send_batch(self, messages: list[MessageSchema]) -> list[int]:
+        return self.run(self._send_batch(messages))
+
+    async def _send_batch(self, messages: list[MessageSchema]) -> list[int]:
+        mimes = [build_mime(message, self.sender) for message in messages]
+        return await self.pool.send_many(mimes)
+
+    def stop(self) -> None:
+        with self._lock:
+            if self._pid != os.getpid():
+                return
+
+            try:
+                asyncio.run_coroutine_threadsafe(
+                    self.pool.close(), self._loop
+                ).result(timeout=self.pool.timeout)
+            except Exception as e:
+                logging.warning("Closing SMTP connections failed: %s", e)
+
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join()
+            self._loop.close()
+            self._pid = None
+
+
+mail_worker = MailWorker(
+    sender=formataddr((Config.MAIL_FROM_NAME, Config.MAIL_FROM)),
+    hostname=Config.MAIL_SERVER,
+    port=Config.MAIL_PORT,
+    username=Config.MAIL_USERNAME,
+    password=Config.MAIL_PASSWORD,
+    use_credentials=Config.USE_CREDENTIALS,
+    start_tls=Config.MAIL_STARTTLS,
+    use_tls=Config.MAIL_SSL_TLS,
+    validate_certs=Config.VALIDATE_CERTS,
+    size=Config.MAIL_POOL_SIZE,
+    max_messages=Config.MAIL_MAX_MESSAGES_PER_CONNECTION,
+    timeout=Config.MAIL_TIMEOUT,
+)
@@ -1,11 +1,12 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, Response
 from contextlib import asynccontextmanager
 from books.routes import book_router
 from auth.routes import auth_router
 from reviews.routes import review_router
-from db.database import init_db
+from db.database import init_db, get_pool_stats
 from errors import register_all_errors
 from middleware import register_middleware
+from metrics import render_metrics
 
 
 @asynccontextmanager
@@ -35,3 +36,14 @@ register_middleware(app)
 app.include_router(book_router, prefix=f"/api/{version}/books", tags=["Books"])
 app.include_router(auth_router, prefix=f"/api/{version}/auth", tags=["Authentication"])
 app.include_router(review_router, prefix=f"/api/{version}/reviews", tags=["Reviews"])
+
+
+@app.get(f"/api/{version}/health/db", tags=["Health"])
+async def db_pool_health():
+    return get_pool_stats()
+
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    body, content_type = render_metrics()
+    return Response(body, media_type=content_type)
@@ -0,0 +1,121 @@
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+)
+from prometheus_client import multiprocess
+import atexit
+import os
+
+# With PROMETHEUS_MULTIPROC_DIR set (one shared, emptied directory per
+# deployment) every uvicorn worker writes its samples to mmap files there and
+# /metrics aggregates all of them, whichever worker serves the scrape.
+MULTIPROCESS = "PROMETHEUS_MULTIPROC_DIR" in os.environ
+
+FAST_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+
+REQUEST_LATENCY = Histogram(
+    "bookly_request_duration_seconds",
+    "Time from receiving a request until its response starts",
+    ["method", "route", "status"],
+)
+REQUESTS_IN_FLIGHT = Gauge(
+    "bookly_requests_in_flight",
+    "Requests currently being handled",
+    ["method"],
+    multiprocess_mode="livesum",
+)
+
+DB_POOL_CHECKED_OUT = Gauge(
+    "bookly_db_pool_checked_out",
+    "Connections currently checked out of the pool",
+    multiprocess_mode="livesum",
+)
+DB_POOL_OVERFLOW = Gauge(
+    "bookly_db_pool_overflow",
+    "Connections open beyond pool_size",
+    multiprocess_mode="livesum",
+)
+DB_POOL_CHECKOUT_WAIT = Histogram(
+    "bookly_db_pool_checkout_wait_seconds",
+    "Time spent waiting to check out a connection",
+    buckets=FAST_BUCKETS,
+)
+
+REDIS_LATENCY = Histogram(
+    "bookly_redis_command_duration_seconds",
+    "Round trip time of Redis commands",
+    ["command"],
+    buckets=FAST_BUCKETS,
+)
+REDIS_ERRORS = Counter(
+    "bookly_redis_command_errors",
+    "Redis commands that raised",
+    ["command"],
+)
+
+REVOCATION_CACHE_HITS = Counter(
+    "bookly_revocation_cache_hits",
+    "Blocklist lookups answered from the in-process revocation cache",
+)
+REVOCATION_CACHE_MISSES = Counter(
+    "bookly_revocation_cache_misses",
+    "Blocklist lookups that had to go to Redis",
+)
+
+HASH_POOL_QUEUE_DEPTH = Gauge(
+    "bookly_hash_pool_queue_depth",
+    "Password hash jobs accepted but not yet running on a worker",
+    multiprocess_mode="livesum",
+)
+HASH_POOL_REJECTED = Counter(
+    "bookly_hash_pool_rejected",
+    "Password hash jobs refused because the queue was full or too slow",
+)
+
+CELERY_ENQUEUE_LATENCY = Histogram(
+    "bookly_celery_enqueue_duration_seconds",
+    "Time taken to publish a task to the broker",
+    ["task"],
+    buckets=FAST_BUCKETS,
+)
+
+# Recorded by the Celery worker that sends the batch, not by the web process.
+# They only show up on /metrics when the workers run on the same host with the
+# same PROMETHEUS_MULTIPROC_DIR as uvicorn; otherwise scrape them separately.
+EMAIL_BATCH_SIZE = Histogram(
+    "bookly_email_batch_size",
+    "Messages taken off the buffer per batch, before de-duplication",
+    buckets=(1, 5, 10, 25, 50, 100, 250, 500, 1000),
+)
+EMAIL_BATCH_DURATION = Histogram(
+    "bookly_email_batch_duration_seconds",
+    "Time taken to send one batch over SMTP",
+)
+EMAIL_BATCH_COALESCED = Counter(
+    "bookly_email_batch_coalesced",
+    "Duplicate messages dropped from batches",
+)
+EMAIL_BATCH_FAILED = Counter(
+    "bookly_email_batch_failed",
+    "Batched messages handed back to send_email for retrying",
+)
+
+
+def render_metrics() -> tuple[bytes, str]:
+    if MULTIPROCESS:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+
+    return generate_latest(registry), CONTENT_TYPE_LATEST
+
+
+if MULTIPROCESS:
+    # Drops this worker's live gauges once it exits
+    atexit.register(multiprocess.mark_process_dead, os.getpid())
@@ -2,28 +2,128 @@ from fastapi import FastAPI, Request, status
 from fastapi.responses import JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.middleware.trustedhost import TrustedHostMiddleware
+from logging.handlers import QueueHandler, QueueListener
+from compression import CompressionMiddleware
+from config import Config
+from metrics import REQUEST_LATENCY, REQUESTS_IN_FLIGHT
 
+import atexit
+import json
+import queue
+import random
+import sys
 import time
+import uuid
 import logging
 
 logger = logging.getLogger("uvicorn.access")
 logger.disabled = True
 
+access_logger = logging.getLogger("bookly.access")
+
+MAX_REQUEST_ID_LENGTH = 128
+
+
+class AccessLogFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        return json.dumps({"ts": record.created, **record.msg})
+
+
+class AccessLogQueueHandler(QueueHandler):
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Hand the record over untouched; formatting happens on the
+        # listener thread rather than on the event loop
+        return record
+
+
+def setup_access_log() -> QueueListener:
+    log_queue = queue.SimpleQueue()
+
+    stream_handler = logging.StreamHandler(sys.stdout)
+    stream_handler.setFormatter(AccessLogFormatter())
+
+    access_logger.addHandler(AccessLogQueueHandler(log_queue))
+    access_logger.setLevel(logging.INFO)
+    access_logger.propagate = False
+
+    listener = QueueListener(log_queue, stream_handler)
+    listener.start()
+    atexit.register(listener.stop)
+
+    return listener
+
+
+def observe_latency(request: Request, status_code: int, processing_time: int) -> None:
+    # Label by route template, not raw path, to keep cardinality bounded
+    route = getattr(request.scope.get("route"), "path", "unmatched")
+    REQUEST_LATENCY.labels(request.method, route, status_code).observe(
+        processing_time / 1_000_000_000
+    )
+
+
+def log_request(request: Request, status_code: int, processing_time: int) -> None:
+    # Server errors are always logged, everything else is sampled
+    if status_code < 500 and random.random() >= Config.ACCESS_LOG_SAMPLE_RATE:
+        return
+
+    client = request.client
+    access_logger.info(
+        {
+            "request_id": request.state.request_id,
+            "client": f"{client.host}:{client.port}" if client else None,
+            "method": request.method,
+            "path": request.url.path,
+            "status": status_code,
+            "duration_ms": processing_time / 1_000_000,
+        }
+    )
+
 
 def register_middleware(app: FastAPI):
+    setup_access_log()
+
     @app.middleware("http")
-    async def custom_login(request: Request, call_next):
-        start_time = time.time()
+    async def access_log(request: Request, call_next):
+        start_time = time.perf_counter_ns()
 
-        print("before", start_time)
+        request_id = request.headers.get(Config.REQUEST_ID_HEADER)
+        if not request_id:
+            request_id = uuid.uuid4().hex
+        request_id = request_id[:MAX_REQUEST_ID_LENGTH]
+        request.state.request_id = request_id
 
-        response = await call_next(request)
-        processing_time = time.time() - start_time
-        message = f"{request.client.host}:{request.client.port} {request.method} - {request.url.path} - {response.status_code} completed after {processing_time}s"
-        print(message)
+        in_flight = REQUESTS_IN_FLIGHT.labels(request.method)
+        in_flight.inc()
+        try:
+            response = await call_next(request)
+        except Exception:
+            # The 500 itself is rendered further out by the server error
+            # handler, which copies the request ID header from request.state
+            processing_time = time.perf_counter_ns() - start_time
+            observe_latency(
+                request, status.HTTP_500_INTERNAL_SERVER_ERROR, processing_time
+            )
+            log_request(request, status.HTTP_500_INTERNAL_SERVER_ERROR, processing_time)
+            raise
+        finally:
+            in_flight.dec()
+        processing_time = time.perf_counter_ns() - start_time
+
+        observe_latency(request, response.status_code, processing_time)
+
+        response.headers[Config.REQUEST_ID_HEADER] = request_id
+
+        log_request(request, response.status_code, processing_time)
 
         return response
 
+    app.add_middleware(
+        CompressionMiddleware,
+        minimum_size=Config.COMPRESSION_MINIMUM_SIZE,
+        gzip_level=Config.COMPRESSION_GZIP_LEVEL,
+        brotli_quality=Config.COMPRESSION_BROTLI_QUALITY,
+    )
+
     app.add_middleware(
         CORSMiddleware,
         allow_origins=["*"],
@@ -1,14 +1,37 @@
-from fastapi import APIRouter, Depends, status
+from fastapi import APIRouter, Depends, Query, status
 from reviews.service import ReviewService
 from sqlmodel.ext.asyncio.session import AsyncSession
-from reviews.schema import ReviewCreate, Review
-from auth.dependencies import get_current_user
+from reviews.schema import ReviewCreate, Review, ReviewPage
+from auth.dependencies import get_current_user, access_token_bearer, RoleChecker
 from db.models import User
 from db.database import get_session
+from config import Config
+from typing import Literal
 
 review_service = ReviewService()
 
 review_router = APIRouter()
+role_checker = Depends(RoleChecker(["admin", "user"]))
+
+
+@review_router.get(
+    "/book/{book_uid}",
+    response_model=ReviewPage,
+    status_code=status.HTTP_200_OK,
+    dependencies=[role_checker],
+)
+async def get_book_reviews(
+    book_uid: str,
+    limit: int = Query(Config.DEFAULT_PAGE_SIZE, ge=1, le=Config.MAX_PAGE_SIZE),
+    cursor: str | None = None,
+    sort: Literal["recent", "rating"] = "recent",
+    session: AsyncSession = Depends(get_session),
+    token_details: dict = Depends(access_token_bearer),
+):
+    reviews = await review_service.get_book_reviews(
+        book_uid, session, limit, cursor, sort
+    )
+    return reviews
 
 
 @review_router.post(
@@ -1,6 +1,6 @@
 from pydantic import BaseModel, Field
 from datetime import datetime
-from typing import Optional
+from typing import List, Optional
 import uuid
 
 
@@ -17,3 +17,8 @@ class Review(BaseModel):
     book_uid: Optional[uuid.UUID]
     created_at: datetime
     updated_at: datetime
+
+
+class ReviewPage(BaseModel):
+    items: List[Review] = []
+    next_cursor: Optional[str] = None
@@ -1,6 +1,11 @@
-from db.models import Reviews
+from db.models import Reviews, Book
+from sqlmodel import update, select, desc, tuple_
+from utils import encode_sort_cursor, decode_sort_cursor
+from datetime import datetime
+import uuid
 from auth.service import UserService
 from books.service import BookService
+from books.cache import book_cache
 from sqlmodel.ext.asyncio.session import AsyncSession
 from reviews.schema import ReviewCreate
 from fastapi import HTTPException, status
@@ -10,8 +15,50 @@ import logging
 user_service = UserService()
 book_service = BookService()
 
+# Same shape as BOOK_SORTS: the column to order by and its cursor type
+REVIEW_SORTS = {
+    "recent": (Reviews.created_at, datetime.fromisoformat),
+    "rating": (Reviews.rating, int),
+}
+
 
 class ReviewService:
+    async def get_book_reviews(
+        self,
+        book_uid: str,
+        session: AsyncSession,
+        limit: int,
+        cursor: str | None = None,
+        sort: str = "recent",
+    ):
+        sort_column, sort_type = REVIEW_SORTS[sort]
+
+        statement = select(Reviews).where(Reviews.book_uid == book_uid)
+
+        if cursor is not None:
+            key, uid = decode_sort_cursor(cursor, sort, sort_type, uuid.UUID)
+            statement = statement.where(
+                tuple_(sort_column, Reviews.uid) < tuple_(key, uid)
+            )
+
+        statement = statement.order_by(desc(sort_column), desc(Reviews.uid)).limit(
+            limit + 1
+        )
+
+        result = await session.exec(statement)
+
+        reviews = result.all()
+
+        next_cursor = None
+        if len(reviews) > limit:
+            reviews = reviews[:limit]
+            last = reviews[-1]
+            next_cursor = encode_sort_cursor(
+                sort, getattr(last, sort_column.key), last.uid
+            )
+
+        return {"items": reviews, "next_cursor": next_cursor}
+
     async def add_review_to_book(
         self,
         user_email: str,
@@ -37,13 +84,25 @@ class ReviewService:
                     detail="User not found"
                 )
 
-            new_review.user = user
-            new_review.book = book
+            new_review.user_uid = user.uid
+            new_review.book_uid = book.uid
 
             session.add(new_review)
 
+            # Atomic increment, so concurrent reviews of one book cannot lose counts
+            await session.exec(
+                update(Book)
+                .where(Book.uid == book.uid)
+                .values(
+                    review_count=Book.review_count + 1,
+                    rating_sum=Book.rating_sum + new_review.rating,
+                )
+            )
+
             await session.commit()
 
+            await book_cache.invalidate(book_uid)
+
             return new_review
 
         except Exception as e:
@@ -17,22 +17,145 @@ from datetime import timedelta, datetime
 from config import Config
 import jwt
 import uuid
+import json
+import base64
+import hashlib
+import asyncio
 import logging
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
 from itsdangerous import URLSafeTimedSerializer
+from pydantic import BaseModel, create_model
+from pydantic_core import to_json
+from functools import lru_cache
+from errors import InvalidCursorException, InvalidFieldsException, ServerBusyException
+from metrics import HASH_POOL_QUEUE_DEPTH, HASH_POOL_REJECTED
 
 passwd_context = CryptContext(schemes=["bcrypt"])
 ACCESS_TOKEN_EXPIRY = 3600
 
 
+def _hash_password(password: str) -> str:
+    return passwd_context.hash(password)
+
+
+def _verify_password(password: str, hash: str) -> bool:
+    return passwd_context.verify(password, hash)
+
+
+class HashPool:
+    """Runs bcrypt off the event loop on a bounded thread or process pool"""
+
+    def __init__(
+        self,
+        kind: str,
+        workers: int,
+        max_pending: int,
+        max_waiters: int,
+        wait_timeout: float,
+    ) -> None:
+        self.kind = kind
+        self.workers = workers
+        self.max_pending = max_pending
+        self.max_waiters = max_waiters
+        self.wait_timeout = wait_timeout
+        self.rejected = 0
+        self.waiting = 0
+        self.in_flight = 0
+        self._executor = None
+        self._slots = asyncio.Semaphore(max_pending)
+
+    @property
+    def executor(self):
+        if self._executor is None:
+            if self.kind == "process":
+                self._executor = ProcessPoolExecutor(max_workers=self.workers)
+            else:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.workers, thread_name_prefix="bcrypt"
+                )
+
+        return self._executor
+
+    @property
+    def queue_depth(self) -> int:
+        """Hashes accepted but not yet running on a worker"""
+        return self.waiting + max(self.in_flight - self.workers, 0)
+
+    async def run(self, fn, *args):
+        # Only max_pending jobs are handed to the executor at a time and only
+        # max_waiters more may queue behind them. Past that, or once a caller
+        # has waited wait_timeout, the request is refused with a 503 instead
+        # of letting a login burst build a backlog nobody will wait for.
+        if self._slots.locked() and self.waiting >= self.max_waiters:
+            self._reject()
+
+        self.waiting += 1
+        self._report()
+        try:
+            await asyncio.wait_for(self._slots.acquire(), self.wait_timeout)
+        except asyncio.TimeoutError:
+            self._reject()
+        finally:
+            self.waiting -= 1
+            self._report()
+
+        self.in_flight += 1
+        self._report()
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self.executor, fn, *args)
+        finally:
+            self.in_flight -= 1
+            self._slots.release()
+            self._report()
+
+    def _reject(self):
+        self.rejected += 1
+        HASH_POOL_REJECTED.inc()
+        raise ServerBusyException()
+
+    def _report(self) -> None:
+        HASH_POOL_QUEUE_DEPTH.set(self.queue_depth)
+
+    def stats(self) -> dict:
+        return {
+            "kind": self.kind,
+            "workers": self.workers,
+            "queue_depth": self.queue_depth,
+            "in_flight": self.in_flight,
+            "rejected": self.rejected,
+        }
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+
+
+hash_pool = HashPool(
+    kind=Config.HASH_POOL_KIND,
+    workers=Config.HASH_POOL_WORKERS,
+    max_pending=Config.HASH_POOL_MAX_PENDING,
+    max_waiters=Config.HASH_POOL_MAX_WAITERS,
+    wait_timeout=Config.HASH_POOL_WAIT_TIMEOUT_MS / 1000,
+)
+
+
 class Hash:
 
     def generate_password_hash(password: str) -> str:
-        hash = passwd_context.hash(password)
+        hash = _hash_password(password)
 
         return hash
 
     def verify_password(password: str, hash: str) -> bool:
-        return passwd_context.verify(password, hash)
+        return _verify_password(password, hash)
+
+    async def generate_password_hash_async(password: str) -> str:
+        return await hash_pool.run(_hash_password, password)
+
+    async def verify_password_async(password: str, hash: str) -> bool:
+        return await hash_pool.run(_verify_password, password, hash)
 
 
 class Tokens:
@@ -88,4 +211,89 @@ def decode_url_safe_token(token: str):
         return token_data
     
     except Exception as e:
-        logging.error(str(e))
\ No newline at end of file
+        logging.error(str(e))
+
+
+def encode_cursor(*values) -> str:
+    payload = to_json(list(values))
+
+    return base64.urlsafe_b64encode(payload).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, *types) -> list:
+    """Decode a cursor made by encode_cursor, converting each value with types"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded))
+
+        if len(values) != len(types):
+            raise ValueError("Cursor does not match the requested ordering")
+
+        return [convert(value) for convert, value in zip(types, values)]
+
+    except Exception as e:
+        logging.error(str(e))
+        raise InvalidCursorException()
+
+
+def encode_sort_cursor(sort: str, *values) -> str:
+    """A cursor that remembers which sort order its values belong to"""
+    return encode_cursor(sort, *values)
+
+
+def decode_sort_cursor(cursor: str, sort: str, *types) -> list:
+    """Decode a cursor from encode_sort_cursor, rejecting one from another sort"""
+    cursor_sort, *values = decode_cursor(cursor, str, *types)
+
+    # Keyset values from one sort column mean nothing against another
+    if cursor_sort != sort:
+        raise InvalidCursorException()
+
+    return values
+
+
+def parse_fields(fields: str | None, allowed) -> list[str] | None:
+    """Turn a comma separated ?fields= value into a list of known field names"""
+    if not fields:
+        return None
+
+    requested = [field.strip() for field in fields.split(",") if field.strip()]
+
+    if not requested or any(field not in allowed for field in requested):
+        raise InvalidFieldsException()
+
+    return list(dict.fromkeys(requested))
+
+
+@lru_cache(maxsize=256)
+def projection_model(base: type[BaseModel], fields: tuple[str, ...]) -> type[BaseModel]:
+    """A copy of base narrowed down to fields, built once per field set"""
+    return create_model(
+        f"{base.__name__}Projection",
+        **{
+            field: (base.model_fields[field].annotation, base.model_fields[field])
+            for field in fields
+        },
+    )
+
+
+def make_etag(*parts, weak: bool = False) -> str:
+    """An opaque entity tag derived from the JSON form of parts"""
+    digest = hashlib.blake2b(to_json(parts), digest_size=16).hexdigest()
+
+    return f'W/"{digest}"' if weak else f'"{digest}"'
+
+
+def etag_matches(if_none_match: str | None, etag: str) -> bool:
+    """Weak comparison of an If-None-Match header against etag (RFC 9110)"""
+    if not if_none_match:
+        return False
+
+    if if_none_match.strip() == "*":
+        return True
+
+    opaque = etag.removeprefix("W/")
+
+    return any(
+        tag.strip().removeprefix("W/") == opaque for tag in if_none_match.split(",")
+    )
@@ -0,0 +1,60 @@
+"""
+Bytes saved and CPU spent compressing typical book list responses.
+
+Serializes BookPage payloads the size of a default page, a full page and an
+export-sized chunk, then compresses each with the settings
+CompressionMiddleware would use, at a few levels either side of the default.
+
+    python benchmarks/compression.py --sizes 20 100 1000 --repeat 20
+"""
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "app" / "src"))
+
+from compression import BrotliCompressor, GzipCompressor, brotli
+from books.schemas import book_page_adapter
+from json_serialization import make_page
+
+GZIP_LEVELS = (1, 6, 9)
+BROTLI_QUALITIES = (1, 4, 6)
+
+
+def cpu_ms(make_compressor, body: bytes, repeat: int) -> tuple[float, int]:
+    best = float("inf")
+
+    for _ in range(repeat):
+        start = time.process_time()
+        compressor = make_compressor()
+        compressed = compressor.compress(body) + compressor.finish()
+        best = min(best, time.process_time() - start)
+
+    return best * 1000, len(compressed)
+
+
+def main(args):
+    for size in args.sizes:
+        page = book_page_adapter.validate_python(make_page(size), from_attributes=True)
+        body = book_page_adapter.dump_json(page)
+        print(f"{size:>5} books: {len(body):>10} bytes uncompressed")
+
+        codecs = [(f"gzip-{level}", GzipCompressor, level) for level in GZIP_LEVELS]
+        if brotli is not None:
+            codecs += [(f"br-{q}", BrotliCompressor, q) for q in BROTLI_QUALITIES]
+
+        for name, codec, setting in codecs:
+            ms, length = cpu_ms(lambda: codec(setting), body, args.repeat)
+            print(
+                f"      {name:>7}: {length:>10} bytes  "
+                f"saved {1 - length / len(body):6.1%}  {ms:8.3f}ms cpu"
+            )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[20, 100, 1000])
+    parser.add_argument("--repeat", type=int, default=20)
+    main(parser.parse_args())
@@ -0,0 +1,133 @@
+"""
+Seed a large dataset and show query plans for the hot lookups with and
+without the indexes from migration 5b8e2f1c9a47.
+
+Run against a scratch database that is already migrated to head:
+
+    DATABASE_URL=postgresql+asyncpg://... python benchmarks/explain_indexes.py --seed --users 50000
+
+The "before" plans are taken inside a transaction that drops the indexes
+and is then rolled back, so the schema is left untouched.
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "app" / "src"))
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import create_async_engine
+
+INDEXES = [
+    "ix_users_email",
+    "ix_books_created_at_uid",
+    "ix_books_user_uid_created_at_uid",
+    "ix_reviews_book_uid",
+    "ix_reviews_user_uid",
+]
+
+SEED = [
+    """
+    INSERT INTO users (uid, username, email, first_name, last_name, role,
+                       is_verified, password_hash, created_at, updated_at)
+    SELECT gen_random_uuid(), 'bench' || i, 'bench' || i || '@bench.local',
+           'Bench', 'User', 'user', true, 'x',
+           now() - (i || ' seconds')::interval, now()
+    FROM generate_series(1, :users) AS i
+    """,
+    """
+    INSERT INTO books (uid, title, author, publisher, published_date, page_count,
+                       language, user_uid, created_at, updated_at)
+    SELECT gen_random_uuid(), 'Book ' || u.username || '-' || i, 'Author ' || i,
+           'Publisher', current_date, 100 + i, 'en', u.uid,
+           now() - (random() * interval '365 days'), now()
+    FROM users AS u, generate_series(1, :books_per_user) AS i
+    WHERE u.email LIKE '%@bench.local'
+    """,
+    """
+    INSERT INTO reviews (uid, rating, review_text, user_uid, book_uid,
+                         created_at, updated_at)
+    SELECT gen_random_uuid(), (random() * 4)::int, 'Bench review', b.user_uid,
+           b.uid, now(), now()
+    FROM books AS b, generate_series(1, :reviews_per_book) AS i
+    WHERE b.author LIKE 'Author %'
+    """,
+    "ANALYZE users",
+    "ANALYZE books",
+    "ANALYZE reviews",
+]
+
+QUERIES = {
+    "user by email": """
+        SELECT * FROM users WHERE email = 'bench42@bench.local'
+    """,
+    "all books, first page": """
+        SELECT * FROM books ORDER BY created_at DESC, uid DESC LIMIT 21
+    """,
+    "all books, deep page": """
+        SELECT * FROM books
+        WHERE (created_at, uid) < (now() - interval '180 days', 'ffffffff-ffff-ffff-ffff-ffffffffffff')
+        ORDER BY created_at DESC, uid DESC LIMIT 21
+    """,
+    "user books": """
+        SELECT * FROM books
+        WHERE user_uid = (SELECT uid FROM users WHERE email = 'bench42@bench.local')
+        ORDER BY created_at DESC, uid DESC LIMIT 21
+    """,
+    "reviews for a book": """
+        SELECT * FROM reviews
+        WHERE book_uid = (SELECT uid FROM books ORDER BY created_at DESC LIMIT 1)
+    """,
+    "reviews by a user": """
+        SELECT * FROM reviews
+        WHERE user_uid = (SELECT uid FROM users WHERE email = 'bench42@bench.local')
+    """,
+}
+
+
+async def explain_all(conn) -> None:
+    for name, query in QUERIES.items():
+        result = await conn.execute(text(f"EXPLAIN (ANALYZE, BUFFERS) {query}"))
+        print(f"--- {name}")
+        for (line,) in result:
+            print(f"    {line}")
+
+
+async def main(args) -> None:
+    engine = create_async_engine(os.environ["DATABASE_URL"])
+
+    if args.seed:
+        async with engine.begin() as conn:
+            params = {
+                "users": args.users,
+                "books_per_user": args.books_per_user,
+                "reviews_per_book": args.reviews_per_book,
+            }
+            for statement in SEED:
+                await conn.execute(text(statement), params)
+
+    async with engine.connect() as conn:
+        transaction = await conn.begin()
+        for index in INDEXES:
+            await conn.execute(text(f"DROP INDEX IF EXISTS {index}"))
+        print("===== before (indexes dropped)")
+        await explain_all(conn)
+        await transaction.rollback()
+
+    async with engine.connect() as conn:
+        print("===== after")
+        await explain_all(conn)
+
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--seed", action="store_true")
+    parser.add_argument("--users", type=int, default=20000)
+    parser.add_argument("--books-per-user", type=int, default=10)
+    parser.add_argument("--reviews-per-book", type=int, default=3)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,114 @@
+"""
+Throughput of serializing a page of books, 1k and 10k items at a time.
+
+Compares the response_model path FastAPI takes for a plain return value
+(validate, dump to Python objects, json.dumps in JSONResponse) with the
+FAST_JSON_RESPONSES path, which validates through the precompiled
+books.schemas.book_page_adapter and dumps straight to bytes.
+
+    python benchmarks/json_serialization.py --sizes 1000 10000 --repeat 5
+"""
+
+import argparse
+import asyncio
+import datetime
+import sys
+import time
+import uuid
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "app" / "src"))
+
+from fastapi.responses import JSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_model_field
+
+from books.schemas import BookPage, book_page_adapter
+from db.models import Book, Reviews
+
+REVIEWS_PER_BOOK = 2
+
+response_field = create_model_field(
+    name="Response_get_all_books", type_=BookPage, mode="serialization"
+)
+
+
+def make_page(size: int) -> dict:
+    """ORM books the way the list endpoints hand them to the response"""
+    now = datetime.datetime.now()
+    items = []
+
+    for i in range(size):
+        book = Book(
+            uid=uuid.uuid4(),
+            title=f"Book number {i}",
+            author="Chinua Achebe",
+            publisher="Heinemann",
+            published_date=datetime.date(1958, 6, 17),
+            page_count=209,
+            language="en",
+            user_uid=uuid.uuid4(),
+            review_count=REVIEWS_PER_BOOK,
+            rating_sum=7,
+            created_at=now,
+            updated_at=now,
+        )
+        book.avg_rating = 3.5
+        reviews = [
+            Reviews(
+                uid=uuid.uuid4(),
+                rating=3 + j % 2,
+                review_text="A classic of modern African literature.",
+                user_uid=book.user_uid,
+                book_uid=book.uid,
+                created_at=now,
+                updated_at=now,
+            )
+            for j in range(REVIEWS_PER_BOOK)
+        ]
+        items.append({**book.model_dump(), "reviews": reviews})
+
+    return {"items": items, "next_cursor": "WyIyMDI2LTAxLTAxIiwiYWJjIl0"}
+
+
+async def response_model_path(page: dict) -> bytes:
+    content = await serialize_response(field=response_field, response_content=page)
+    return JSONResponse(content).body
+
+
+async def fast_path(page: dict) -> bytes:
+    page = book_page_adapter.validate_python(page, from_attributes=True)
+    return book_page_adapter.dump_json(page)
+
+
+async def measure(serializer, page: dict, repeat: int) -> tuple[float, int]:
+    best = float("inf")
+
+    for _ in range(repeat):
+        start = time.perf_counter()
+        body = await serializer(page)
+        best = min(best, time.perf_counter() - start)
+
+    return best, len(body)
+
+
+async def main(args):
+    for size in args.sizes:
+        page = make_page(size)
+
+        for name, serializer in (
+            ("response_model", response_model_path),
+            ("fast", fast_path),
+        ):
+            seconds, length = await measure(serializer, page, args.repeat)
+            print(
+                f"{size:>6} books  {name:>14}: {seconds * 1000:8.2f}ms  "
+                f"{size / seconds:10.0f} books/s  {length / seconds / 2**20:7.1f} MiB/s"
+            )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000])
+    parser.add_argument("--repeat", type=int, default=5)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,54 @@
+"""add hot lookup indexes
+
+Revision ID: 5b8e2f1c9a47
+Revises: 171ae7b58508
+Create Date: 2026-10-18 09:12:44.310582
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5b8e2f1c9a47'
+down_revision: Union[str, Sequence[str], None] = '171ae7b58508'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+INDEXES = [
+    ('ix_users_email', 'users', ['email'], True),
+    ('ix_books_created_at_uid', 'books', ['created_at', 'uid'], False),
+    ('ix_books_user_uid_created_at_uid', 'books', ['user_uid', 'created_at', 'uid'], False),
+    ('ix_reviews_book_uid', 'reviews', ['book_uid'], False),
+    ('ix_reviews_user_uid', 'reviews', ['user_uid'], False),
+]
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Built CONCURRENTLY so a large live table is not write-locked while the
+    # index builds; that cannot run inside the migration transaction.
+    # ix_users_email is unique: duplicate emails must be cleaned up first.
+    with op.get_context().autocommit_block():
+        for name, table, columns, unique in INDEXES:
+            op.create_index(
+                name,
+                table,
+                columns,
+                unique=unique,
+                postgresql_concurrently=True,
+                if_not_exists=True,
+            )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        for name, table, _, _ in reversed(INDEXES):
+            op.drop_index(
+                name, table_name=table, postgresql_concurrently=True, if_exists=True
+            )
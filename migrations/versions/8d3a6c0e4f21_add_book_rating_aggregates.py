@@ -0,0 +1,66 @@
+"""add book rating aggregates
+
+Revision ID: 8d3a6c0e4f21
+Revises: 5b8e2f1c9a47
+Create Date: 2026-10-18 10:02:19.844310
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8d3a6c0e4f21'
+down_revision: Union[str, Sequence[str], None] = '5b8e2f1c9a47'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+AVG_RATING_SQL = (
+    "CASE WHEN review_count > 0 "
+    "THEN CAST(rating_sum AS DOUBLE PRECISION) / review_count ELSE 0 END"
+)
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('books', sa.Column('review_count', sa.INTEGER(), server_default='0', nullable=False))
+    op.add_column('books', sa.Column('rating_sum', sa.INTEGER(), server_default='0', nullable=False))
+
+    # The backfill rewrites every book row, and adding the STORED generated
+    # column below rewrites the table again under an ACCESS EXCLUSIVE lock.
+    # Run this in a maintenance window on large tables.
+    op.execute(
+        """
+        UPDATE books
+        SET review_count = totals.review_count, rating_sum = totals.rating_sum
+        FROM (
+            SELECT book_uid, count(*) AS review_count, coalesce(sum(rating), 0) AS rating_sum
+            FROM reviews
+            WHERE book_uid IS NOT NULL
+            GROUP BY book_uid
+        ) AS totals
+        WHERE books.uid = totals.book_uid
+        """
+    )
+
+    op.add_column('books', sa.Column('avg_rating', postgresql.DOUBLE_PRECISION(), sa.Computed(AVG_RATING_SQL, persisted=True), nullable=False))
+
+    with op.get_context().autocommit_block():
+        op.create_index('ix_books_avg_rating_uid', 'books', ['avg_rating', 'uid'], unique=False, postgresql_concurrently=True, if_not_exists=True)
+        op.create_index('ix_books_review_count_uid', 'books', ['review_count', 'uid'], unique=False, postgresql_concurrently=True, if_not_exists=True)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_books_review_count_uid', table_name='books', postgresql_concurrently=True, if_exists=True)
+        op.drop_index('ix_books_avg_rating_uid', table_name='books', postgresql_concurrently=True, if_exists=True)
+
+    op.drop_column('books', 'avg_rating')
+    op.drop_column('books', 'rating_sum')
+    op.drop_column('books', 'review_count')
@@ -0,0 +1,36 @@
+"""add review listing indexes
+
+Revision ID: c4f7a1d93e58
+Revises: 8d3a6c0e4f21
+Create Date: 2026-10-18 10:41:07.512936
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c4f7a1d93e58'
+down_revision: Union[str, Sequence[str], None] = '8d3a6c0e4f21'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Both composites lead with book_uid, so the plain FK index is redundant
+    with op.get_context().autocommit_block():
+        op.create_index('ix_reviews_book_uid_created_at_uid', 'reviews', ['book_uid', 'created_at', 'uid'], unique=False, postgresql_concurrently=True, if_not_exists=True)
+        op.create_index('ix_reviews_book_uid_rating_uid', 'reviews', ['book_uid', 'rating', 'uid'], unique=False, postgresql_concurrently=True, if_not_exists=True)
+        op.drop_index('ix_reviews_book_uid', table_name='reviews', postgresql_concurrently=True, if_exists=True)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        op.create_index('ix_reviews_book_uid', 'reviews', ['book_uid'], unique=False, postgresql_concurrently=True, if_not_exists=True)
+        op.drop_index('ix_reviews_book_uid_rating_uid', table_name='reviews', postgresql_concurrently=True, if_exists=True)
+        op.drop_index('ix_reviews_book_uid_created_at_uid', table_name='reviews', postgresql_concurrently=True, if_exists=True)
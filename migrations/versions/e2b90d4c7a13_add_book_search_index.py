@@ -0,0 +1,40 @@
+"""add book search index
+
+Revision ID: e2b90d4c7a13
+Revises: c4f7a1d93e58
+Create Date: 2026-10-18 11:20:53.207114
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e2b90d4c7a13'
+down_revision: Union[str, Sequence[str], None] = 'c4f7a1d93e58'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# Must stay identical to db.models.BOOK_SEARCH_DOCUMENT_SQL or searches
+# will not use the index
+BOOK_SEARCH_DOCUMENT_SQL = (
+    "(setweight(to_tsvector('english', coalesce(title, '')), 'A') || "
+    "setweight(to_tsvector('english', coalesce(author, '')), 'B') || "
+    "setweight(to_tsvector('english', coalesce(publisher, '')), 'C'))"
+)
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    with op.get_context().autocommit_block():
+        op.create_index('ix_books_search_document', 'books', [sa.text(BOOK_SEARCH_DOCUMENT_SQL)], unique=False, postgresql_using='gin', postgresql_concurrently=True, if_not_exists=True)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_books_search_document', table_name='books', postgresql_concurrently=True, if_exists=True)
@@ -0,0 +1,36 @@
+"""add book trigram indexes
+
+Revision ID: f6a3c8e15b92
+Revises: e2b90d4c7a13
+Create Date: 2026-10-18 12:04:31.960228
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f6a3c8e15b92'
+down_revision: Union[str, Sequence[str], None] = 'e2b90d4c7a13'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+
+    with op.get_context().autocommit_block():
+        op.create_index('ix_books_title_trgm', 'books', ['title'], unique=False, postgresql_using='gin', postgresql_ops={'title': 'gin_trgm_ops'}, postgresql_concurrently=True, if_not_exists=True)
+        op.create_index('ix_books_author_trgm', 'books', ['author'], unique=False, postgresql_using='gin', postgresql_ops={'author': 'gin_trgm_ops'}, postgresql_concurrently=True, if_not_exists=True)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    # pg_trgm is left installed; other objects may depend on it
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_books_author_trgm', table_name='books', postgresql_concurrently=True, if_exists=True)
+        op.drop_index('ix_books_title_trgm', table_name='books', postgresql_concurrently=True, if_exists=True)
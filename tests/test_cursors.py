@@ -0,0 +1,41 @@
+"""
+Keyset pagination cursors.
+
+    python -m unittest discover tests
+"""
+
+import unittest
+import uuid
+from datetime import datetime
+
+import support  # noqa: F401
+
+from errors import InvalidCursorException
+from utils import decode_sort_cursor, encode_sort_cursor
+
+
+class SortCursorTest(unittest.TestCase):
+    def test_round_trip(self):
+        uid = uuid.uuid4()
+        created_at = datetime(2026, 1, 2, 3, 4, 5)
+
+        cursor = encode_sort_cursor("recent", created_at, uid)
+
+        self.assertEqual(
+            decode_sort_cursor(cursor, "recent", datetime.fromisoformat, uuid.UUID),
+            [created_at, uid],
+        )
+
+    def test_cursor_from_another_sort_is_rejected(self):
+        cursor = encode_sort_cursor("recent", datetime(2026, 1, 2), uuid.uuid4())
+
+        with self.assertRaises(InvalidCursorException):
+            decode_sort_cursor(cursor, "top_rated", float, uuid.UUID)
+
+    def test_garbage_is_rejected(self):
+        with self.assertRaises(InvalidCursorException):
+            decode_sort_cursor("not-a-cursor", "recent", str, uuid.UUID)
+
+
+if __name__ == "__main__":
+    unittest.main()
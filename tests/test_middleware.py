@@ -0,0 +1,109 @@
+"""
+Responses through the full middleware stack from register_middleware.
+
+    python -m unittest discover tests
+"""
+
+import logging
+import unittest
+
+import support  # noqa: F401
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from config import Config
+from errors import register_all_errors
+from metrics import REGISTRY
+from middleware import access_logger, register_middleware
+
+
+def make_app() -> FastAPI:
+    app = FastAPI()
+    register_middleware(app)
+    register_all_errors(app)
+
+    @app.get("/small")
+    async def small():
+        return {"x": 1}
+
+    @app.get("/large")
+    async def large():
+        return {"items": ["book"] * Config.COMPRESSION_MINIMUM_SIZE}
+
+    @app.get("/boom")
+    async def boom():
+        raise RuntimeError("boom")
+
+    return app
+
+
+class RecordingHandler(logging.Handler):
+    def __init__(self):
+        super().__init__()
+        self.records = []
+
+    def emit(self, record):
+        self.records.append(record.msg)
+
+
+# register_middleware starts the access log listener, so build the app once
+app = make_app()
+
+
+class CompressionTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.client = TestClient(app, base_url="http://localhost")
+
+    def test_small_response_is_not_compressed(self):
+        response = self.client.get("/small", headers={"Accept-Encoding": "gzip"})
+
+        self.assertEqual(response.json(), {"x": 1})
+        self.assertNotIn("content-encoding", response.headers)
+        self.assertEqual(response.headers["content-length"], "7")
+
+    def test_large_response_is_compressed(self):
+        response = self.client.get("/large", headers={"Accept-Encoding": "gzip"})
+
+        self.assertEqual(response.headers["content-encoding"], "gzip")
+        self.assertIn("Accept-Encoding", response.headers["vary"])
+        self.assertEqual(len(response.json()["items"]), Config.COMPRESSION_MINIMUM_SIZE)
+
+
+
+class AccessLogTest(unittest.TestCase):
+    def setUp(self):
+        self.client = TestClient(
+            app, base_url="http://localhost", raise_server_exceptions=False
+        )
+        self.handler = RecordingHandler()
+        access_logger.addHandler(self.handler)
+        self.addCleanup(access_logger.removeHandler, self.handler)
+
+    def latency_count(self, status: str) -> float:
+        return REGISTRY.get_sample_value(
+            "bookly_request_duration_seconds_count",
+            {"method": "GET", "route": "/boom", "status": status},
+        ) or 0
+
+    def test_unhandled_exception_is_logged_with_request_id(self):
+        observed = self.latency_count("500")
+
+        response = self.client.get(
+            "/boom", headers={Config.REQUEST_ID_HEADER: "req-1"}
+        )
+
+        self.assertEqual(response.status_code, 500)
+        self.assertEqual(response.headers[Config.REQUEST_ID_HEADER], "req-1")
+
+        (entry,) = self.handler.records
+        self.assertEqual(entry["request_id"], "req-1")
+        self.assertEqual(entry["status"], 500)
+        self.assertEqual(entry["path"], "/boom")
+        self.assertGreater(entry["duration_ms"], 0)
+        self.assertEqual(self.latency_count("500"), observed + 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,43 @@
+"""
+The in-process cache in front of the Redis token blocklist.
+
+    python -m unittest discover tests
+"""
+
+import unittest
+
+import support  # noqa: F401
+
+from db.redis import RevocationCache
+
+
+class RevocationCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.cache = RevocationCache(max_size=2, negative_ttl=60)
+
+    def test_negative_answer_does_not_overwrite_revocation(self):
+        # Redis said "not revoked", then the pub/sub revocation arrived
+        # before the request got round to caching that answer
+        self.cache.put("jti", True)
+        self.cache.put("jti", False)
+
+        self.assertIs(self.cache.get("jti"), True)
+
+    def test_revocation_overwrites_negative_answer(self):
+        self.cache.put("jti", False)
+        self.cache.put("jti", True)
+
+        self.assertIs(self.cache.get("jti"), True)
+
+    def test_least_recently_used_entry_is_evicted(self):
+        self.cache.put("a", False)
+        self.cache.put("b", False)
+        self.cache.get("a")
+        self.cache.put("c", False)
+
+        self.assertIsNone(self.cache.get("b"))
+        self.assertIs(self.cache.get("a"), False)
+
+
+if __name__ == "__main__":
+    unittest.main()